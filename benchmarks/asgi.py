@@ -0,0 +1,171 @@
+"""Пропускная способность лент под WSGI и ASGI на одном наборе данных.
+
+Режимы:
+
+* ``wsgi`` — синхронные представления, запросы из пула потоков;
+* ``asgi`` — те же синхронные представления через ASGI-обработчик:
+  каждый запрос платит переходом в поток;
+* ``asgi-async`` — posts.async_views (YATUBE_ASYNC_VIEWS=1).
+
+Каждый режим запускается в отдельном процессе: набор маршрутов выбирается
+при импорте urls.py. Данные — одинаковые (posts.seeding с одним seed).
+
+    python -m benchmarks.asgi --size small --requests 500 --concurrency 16
+
+Асинхронный ORM и кэш Django выполняют запросы через
+sync_to_async(thread_sensitive=True), то есть по очереди в одном потоке:
+выигрыш ASGI-режима — в отсутствии лишних переходов между потоками, а не
+в параллельных запросах к БД.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import queue
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import (BASE_DIR, median, percentile, setup_django,
+                              temporary_database)
+from benchmarks.views import SIZES, fixtures, seed_size
+
+MODES = {
+    'wsgi': {'YATUBE_ASYNC_VIEWS': '0'},
+    'asgi': {'YATUBE_ASYNC_VIEWS': '0'},
+    'asgi-async': {'YATUBE_ASYNC_VIEWS': '1'},
+}
+
+
+def feed_urls(values):
+    from django.urls import reverse
+
+    return [
+        reverse('index'),
+        reverse('group_post', args=(values['slug'],)),
+        reverse('follow_index'),
+        reverse('profile', args=(values['username'],)),
+        reverse('post', args=(values['username'], values['post_id'])),
+    ]
+
+
+def run_wsgi(urls, cookies, total, concurrency):
+    from django.db import connection
+    from django.test import Client
+
+    clients = queue.SimpleQueue()
+    for _ in range(concurrency):
+        client = Client()
+        client.cookies = cookies
+        clients.put(client)
+
+    def one(url):
+        client = clients.get()
+        try:
+            start = time.perf_counter()
+            status = client.get(url).status_code
+            return status, (time.perf_counter() - start) * 1000
+        finally:
+            clients.put(client)
+
+    def close():
+        connection.close()
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, itertools.islice(
+            itertools.cycle(urls), total)))
+        # Соединения потоков пула закрываются до удаления тестовой БД.
+        for future in [pool.submit(close) for _ in range(concurrency)]:
+            future.result()
+    return results
+
+
+def run_asgi(urls, cookies, total, concurrency):
+    from django.test import AsyncClient
+
+    pending = itertools.islice(itertools.cycle(urls), total)
+    results = []
+
+    async def worker():
+        client = AsyncClient()
+        client.cookies = cookies
+        for url in pending:
+            start = time.perf_counter()
+            response = await client.get(url)
+            results.append((response.status_code,
+                            (time.perf_counter() - start) * 1000))
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    asyncio.run(main())
+    return results
+
+
+def measure(mode, size, total, concurrency):
+    """Выполняется в дочернем процессе с нужным YATUBE_ASYNC_VIEWS."""
+    from django.test import Client
+
+    setup_django()
+    runner = run_wsgi if mode == 'wsgi' else run_asgi
+    with temporary_database():
+        seed_size(size)
+        values = fixtures()
+        urls = feed_urls(values)
+        login = Client()
+        login.force_login(values['viewer'])
+        # Прогрев: шаблоны, кэш фрагментов, ленивые импорты.
+        runner(urls, login.cookies, len(urls), 1)
+        start = time.perf_counter()
+        results = runner(urls, login.cookies, total, concurrency)
+        elapsed = time.perf_counter() - start
+    timings = [result[1] for result in results]
+    return {
+        'requests': len(results),
+        'errors': sum(status != 200 for status, _ in results),
+        'rps': round(len(results) / elapsed, 1),
+        'p50': round(median(timings), 3),
+        'p95': round(percentile(timings, 95), 3),
+    }
+
+
+def spawn(mode, args):
+    """Запускает режим в отдельном процессе и возвращает его результат."""
+    command = [sys.executable, '-m', 'benchmarks.asgi', '--worker', mode,
+               '--size', args.size, '--requests', str(args.requests),
+               '--concurrency', str(args.concurrency)]
+    output = subprocess.run(command, cwd=BASE_DIR, check=True,
+                            capture_output=True, text=True,
+                            env={**os.environ, **MODES[mode]}).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', choices=SIZES, default='small')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--modes', nargs='+', choices=MODES,
+                        default=list(MODES))
+    parser.add_argument('--output', help='записать результаты в JSON')
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.size, args.requests,
+                                 args.concurrency)))
+        return
+    results = {}
+    for mode in args.modes:
+        row = results[mode] = spawn(mode, args)
+        print(f'{mode:<11}{row["rps"]:>8.1f} req/s  p50 {row["p50"]:>8.2f}  '
+              f'p95 {row["p95"]:>8.2f} ms  ошибок {row["errors"]}')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
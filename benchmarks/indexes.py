@@ -0,0 +1,112 @@
+"""Планы запросов и время горячих выборок до и после индексов 0013.
+
+БД наполняется в текущей схеме; «до» — те же таблицы без индексов и
+ограничения из 0013_feed_indexes, «после» — с ними.
+
+    python -m benchmarks.indexes --posts 50000
+"""
+import argparse
+
+from benchmarks.utils import (measure, median, seed, setup_django,
+                              temporary_database)
+
+# Индексы и ограничение, добавленные 0013_feed_indexes.
+COMPARED = {'comment_post_created_idx', 'post_date_id_idx',
+            'post_author_date_idx', 'post_group_date_idx', 'unique_follow'}
+
+
+def removals():
+    """Операции миграций, убирающие индексы и ограничение из COMPARED."""
+    from django.db import migrations
+    from django.db.models import Index
+
+    from posts.models import Comment, Follow, Post
+
+    return [(migrations.RemoveIndex if isinstance(item, Index)
+             else migrations.RemoveConstraint)(model._meta.model_name,
+                                               item.name)
+            for model in (Comment, Post, Follow)
+            for item in [*model._meta.indexes, *model._meta.constraints]
+            if item.name in COMPARED]
+
+
+def set_indexes(enabled):
+    """Убирает или возвращает индексы из COMPARED.
+
+    Через операции миграций: SQLite удаляет ограничение, пересоздавая
+    таблицу по состоянию модели, и в нём ограничения уже не должно быть.
+    """
+    from django.apps import apps
+    from django.db import connection
+    from django.db.migrations.state import ProjectState
+
+    operations = removals()
+    states = [ProjectState.from_apps(apps)]
+    for operation in operations:
+        state = states[-1].clone()
+        operation.state_forwards('posts', state)
+        states.append(state)
+    steps = list(zip(operations, states, states[1:]))
+    with connection.schema_editor() as editor:
+        if not enabled:
+            for operation, before, after in steps:
+                operation.database_forwards('posts', editor, before, after)
+        else:
+            for operation, before, after in reversed(steps):
+                operation.database_backwards('posts', editor, after, before)
+
+
+def hot_queries():
+    from django.contrib.auth import get_user_model
+    from posts.models import Comment, Follow, Group, Post
+
+    user = get_user_model().objects.order_by('pk')[1]
+    author = Follow.objects.filter(user=user).first().author
+    group = Group.objects.first()
+    post = Post.objects.order_by('-comment_count').first()
+    return {
+        'index': Post.objects.for_feed().order_by('-pub_date', '-id')[:10],
+        'profile': author.posts.order_by('-pub_date', '-id')[:5],
+        'group': group.posts.order_by('-pub_date', '-id')[:5],
+        'follow_index': Post.objects.filter(
+            author__in=Follow.objects.filter(user=user).values('author'))
+        .order_by('-pub_date', '-id')[:10],
+        'is_following': Follow.objects.filter(user=user, author=author),
+        'comments': Comment.objects.filter(post=post).order_by('created'),
+    }
+
+
+def run(repeat):
+    results = {}
+    for name, queryset in hot_queries().items():
+        timings = measure(lambda: list(queryset.all()), repeat)
+        results[name] = (median(timings), queryset.explain())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--posts', type=int, default=50000)
+    parser.add_argument('--comments', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    with temporary_database():
+        seed(users=args.users, posts=args.posts, comments=args.comments)
+        set_indexes(False)
+        before = run(args.repeat)
+        set_indexes(True)
+        after = run(args.repeat)
+
+    for name in before:
+        print(f'== {name}: {before[name][0]:.3f} ms -> '
+              f'{after[name][0]:.3f} ms')
+        for label, result in (('до', before), ('после', after)):
+            plan = result[name][1].replace('\n', '\n' + ' ' * 10)
+            print(f'   {label + ":":<7}{plan}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Одновременная запись в SQLite: настройки по умолчанию против WAL.
+
+Для каждого профиля (YATUBE_SQLITE_PROFILE) создаётся свежая файловая
+БД, наполняется posts.seeding, затем ``--writers`` процессов, как
+воркеры gunicorn, одновременно публикуют посты, комментируют и
+подписываются через представления new_post, add_comment и
+profile_follow/profile_unfollow.
+
+    python -m benchmarks.sqlite_writers --writers 8 --seconds 10
+
+Выводит записи в секунду, p50/p95 и число ошибок «database is locked».
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.utils import BASE_DIR, median, percentile, setup_django
+
+PROFILES = ('default', 'tuned')
+DATASET = {'users': 100, 'posts': 2000, 'comments': 2000, 'images': 0}
+# Пауза на запуск Django во всех процессах перед общим стартом.
+STARTUP = 5.0
+
+
+def prepare():
+    setup_django()
+    from django.core.management import call_command
+
+    from posts import transfer
+    from posts.seeding import Seeder
+
+    call_command('migrate', verbosity=0)
+    Seeder(**DATASET).run()
+    transfer.rebuild_derived()
+
+
+def actions(client, index):
+    """Бесконечный цикл пишущих запросов одного воркера."""
+    from posts.models import Post
+
+    authors = [f'seed{(index * 7 + i) % DATASET["users"]}'
+               for i in range(1, 8)]
+    posts = list(Post.objects.filter(author__username__in=authors)
+                 .values_list('author__username', 'pk')[:20])
+    step = 0
+    while True:
+        step += 1
+        author = authors[step % len(authors)]
+        yield lambda: client.post(
+            '/new/', {'text': f'Пост воркера {index}, шаг {step}'})
+        username, post_id = posts[step % len(posts)]
+        yield lambda: client.post(
+            f'/{username}/{post_id}/comment', {'text': f'Шаг {step}'})
+        yield lambda: client.get(f'/{author}/follow/')
+        yield lambda: client.get(f'/{author}/unfollow/')
+
+
+def write(index, start, seconds):
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.db import OperationalError
+    from django.test import Client
+
+    client = Client()
+    client.force_login(get_user_model().objects.get(username=f'seed{index}'))
+    time.sleep(max(start - time.time(), 0))
+    deadline = time.perf_counter() + seconds
+    timings, locked = [], 0
+    for action in actions(client, index):
+        if time.perf_counter() >= deadline:
+            break
+        began = time.perf_counter()
+        try:
+            action()
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+            continue
+        timings.append((time.perf_counter() - began) * 1000)
+    return {'timings': timings, 'locked': locked}
+
+
+def run_profile(profile, args):
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, 'YATUBE_SQLITE_PROFILE': profile,
+               'YATUBE_DB_NAME': str(Path(directory) / 'db.sqlite3')}
+        command = [sys.executable, '-m', 'benchmarks.sqlite_writers']
+        subprocess.run(command + ['--worker', 'prepare'], cwd=BASE_DIR,
+                       env=env, check=True)
+        start = time.time() + STARTUP
+        workers = [subprocess.Popen(
+            command + ['--worker', 'write', '--index', str(index),
+                       '--start', str(start), '--seconds',
+                       str(args.seconds)],
+            cwd=BASE_DIR, env=env, stdout=subprocess.PIPE, text=True)
+            for index in range(args.writers)]
+        results = [json.loads(worker.communicate()[0].splitlines()[-1])
+                   for worker in workers]
+    timings = [timing for result in results for timing in result['timings']]
+    return {
+        'writes': len(timings),
+        'writes_per_second': round(len(timings) / args.seconds, 1),
+        'locked': sum(result['locked'] for result in results),
+        'p50': round(median(timings), 3),
+        'p95': round(percentile(timings, 95), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES,
+                        default=list(PROFILES))
+    parser.add_argument('--output', help='записать результаты в JSON')
+    parser.add_argument('--worker', choices=('prepare', 'write'),
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--index', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--start', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker == 'prepare':
+        prepare()
+        return
+    if args.worker == 'write':
+        print(json.dumps(write(args.index, args.start, args.seconds)))
+        return
+    results = {}
+    for profile in args.profiles:
+        row = results[profile] = run_profile(profile, args)
+        print(f'{profile:<8}{row["writes_per_second"]:>8.1f} записей/с  '
+              f'p50 {row["p50"]:>8.2f}  p95 {row["p95"]:>8.2f} ms  '
+              f'locked {row["locked"]}')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Стоимость отрисовки карточек постов без БД и HTTP.
+
+Страница ленты из ``--posts`` постов (объекты в памяти, с автором и
+группой) рисуется двумя способами:
+
+* ``include`` — прежний цикл с {% include "post_item.html" %} и четырьмя
+  {% url %} на каждый пост;
+* ``post_cards`` — тег {% post_cards %}: маршруты разворачиваются один
+  раз на страницу.
+
+Каждый способ — с загрузчиком шаблонов без кэша и с cached.Loader.
+
+    python -m benchmarks.templates --posts 10 --repeat 2000
+
+Выводит микросекунды на пост (медиана повторов).
+"""
+import argparse
+import json
+import time
+
+from benchmarks.utils import median, percentile, setup_django
+
+LOADERS = ['django.template.loaders.filesystem.Loader',
+           'django.template.loaders.app_directories.Loader']
+
+# Прежняя разметка карточки, чтобы сравнение не зависело от истории.
+POST_ITEM = """<div class="card mb-3 mt-1 shadow-sm">
+    {% post_picture post %}
+    <div class="card-body">
+        <p class="card-text">
+            <a name="post_{{ post.id }}" href="{% url 'profile' post.author.username %}">
+                <strong class="d-block text-gray-dark">@{{ post.author }}</strong>
+            </a>
+            {{ post.text|linebreaksbr }}
+        </p>
+        {% if post.group %}
+        <a class="card-link muted" href="{% url 'group_post' post.group.slug %}">
+                <strong class="d-block text-gray-dark">#{{ post.group.title }}</strong>
+        </a>
+        {% endif %}
+        <div class="d-flex justify-content-between align-items-center">
+            <div class="btn-group ">
+                <a class="btn btn-sm text-muted" href="{% url 'post' post.author.username post.id %}" role="button">
+                    {% if post.comment_count %}
+                        {{ post.comment_count }} comment{{ post.comment_count|pluralize }}
+                    {% else %}
+                    Add comment
+                    {% endif %}
+                </a>
+                 {% if user == post.author %}
+                 <a class="btn btn-sm text-muted" href="{% url 'post_edit' post.author.username post.id %}" role="button">
+                        Edit
+                 </a>
+                {% endif %}
+            </div>
+            <small class="text-muted">{{ post.pub_date }}</small>
+        </div>
+    </div>
+</div>
+"""
+
+SOURCES = {
+    'bench_post_item.html': '{% load feed_tags %}' + POST_ITEM,
+    'bench_include.html': ('{% for post in page %}'
+                           '{% include "bench_post_item.html" %}'
+                           '{% endfor %}'),
+    'bench_post_cards.html': '{% load feed_tags %}{% post_cards page %}',
+}
+VARIANTS = {'include': 'bench_include.html',
+            'post_cards': 'bench_post_cards.html'}
+
+
+def make_engine(cached):
+    from django.template import Engine
+
+    loaders = [('django.template.loaders.locmem.Loader', SOURCES),
+               *LOADERS]
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    return Engine(loaders=loaders, libraries={
+        'feed_tags': 'posts.templatetags.feed_tags'})
+
+
+def make_page(count):
+    """Посты в памяти: шаблону не нужна БД."""
+    import datetime as dt
+
+    from django.contrib.auth import get_user_model
+
+    from posts.models import Group, Post
+
+    User = get_user_model()
+    authors = [User(pk=pk, username=f'автор_{pk}') for pk in range(1, 6)]
+    group = Group(pk=1, title='Группа', slug='bench-group')
+    page = []
+    for pk in range(1, count + 1):
+        post = Post(pk=pk, text=f'Пост {pk}\nвторая строка',
+                    author=authors[pk % len(authors)],
+                    group=group if pk % 2 else None,
+                    pub_date=dt.datetime(2020, 1, 1, tzinfo=dt.timezone.utc))
+        post.comment_count = pk % 3
+        page.append(post)
+    return page, authors[0]
+
+
+def measure(engine, name, context, repeat):
+    from django.template import Context
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine.get_template(name).render(Context(context))
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--output', help='записать результаты в JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    page, user = make_page(args.posts)
+    context = {'page': page, 'user': user}
+    results = {}
+    for cached in (False, True):
+        engine = make_engine(cached)
+        for variant, name in VARIANTS.items():
+            # Прогрев: импорт тегов, первая загрузка шаблонов.
+            measure(engine, name, context, 10)
+            timings = [timing * 1e6 / args.posts for timing in
+                       measure(engine, name, context, args.repeat)]
+            label = f'{variant}{"+cached" if cached else ""}'
+            row = results[label] = {
+                'p50': round(median(timings), 2),
+                'p95': round(percentile(timings, 95), 2),
+            }
+            print(f'{label:<18}p50 {row["p50"]:>8.2f}  '
+                  f'p95 {row["p95"]:>8.2f} мкс/пост')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import contextlib
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(settings_module='mydict.settings'):
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def temporary_database():
+    """Отдельная тестовая БД, рабочая база не затрагивается."""
+    from django.db import connection
+    from django.test.utils import (setup_test_environment,
+                                   teardown_test_environment)
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed(users=200, posts=20000, groups=10, follows=20, comments=20000,
+         seed=0):
+    """Простое наполнение через bulk_create (сигналы не вызываются)."""
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    from posts.models import Comment, Follow, Group, Post
+    from posts.transfer import explicit_dates
+
+    User = get_user_model()
+    rnd = random.Random(seed)
+    User.objects.bulk_create(
+        [User(username=f'user{i}') for i in range(users)], batch_size=1000)
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        [Group(title=f'Группа {i}', slug=f'group-{i}') for i in
+         range(groups)])
+    group_ids = list(Group.objects.values_list('pk', flat=True)) + [None]
+    now = timezone.now()
+    with explicit_dates(Post, 'pub_date'):
+        Post.objects.bulk_create(
+            [Post(text=f'Пост {i}', author_id=rnd.choice(user_ids),
+                  group_id=rnd.choice(group_ids),
+                  pub_date=now - timezone.timedelta(
+                      minutes=i, seconds=rnd.randint(0, 59)))
+             for i in range(posts)], batch_size=1000)
+    edges = set()
+    for user_id in user_ids:
+        for author_id in rnd.sample(user_ids, min(follows, len(user_ids))):
+            if author_id != user_id:
+                edges.add((user_id, author_id))
+    Follow.objects.bulk_create(
+        [Follow(user_id=u, author_id=a) for u, a in edges], batch_size=1000)
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    Comment.objects.bulk_create(
+        [Comment(post_id=rnd.choice(post_ids), author_id=rnd.choice(user_ids),
+                 text='комментарий') for _ in range(comments)],
+        batch_size=1000)
+
+
+def measure(func, repeat=20):
+    """Возвращает список времён выполнения func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(int(round(p / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def median(values):
+    return statistics.median(values) if values else 0.0
@@ -0,0 +1,252 @@
+"""Время ответа, запросы к БД и память для всех страниц сайта.
+
+Каждый размер данных наполняется в отдельной временной БД (posts.seeding),
+затем все маршруты posts/urls.py, posts/api_urls.py и mydict/urls.py
+открываются тестовым клиентом от имени залогиненного пользователя.
+
+    python -m benchmarks.views --sizes small medium --output baseline.json
+    python -m benchmarks.views --compare benchmarks/baseline.json
+
+С ``--compare`` скрипт завершается с кодом 1, если p95 вырос больше
+чем на ``--threshold`` (и не меньше чем на ``--min-delta`` мс — защита
+от шума на быстрых страницах) или стало больше запросов к БД.
+Времена приводятся к скорости машины через калибровочный цикл, но
+надёжнее всего сравнивать с baseline, снятым на той же машине.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+import tracemalloc
+
+from benchmarks.utils import (measure, median, percentile, setup_django,
+                              temporary_database)
+
+SIZES = {
+    'small': {'users': 200, 'posts': 5000, 'comments': 5000},
+    'medium': {'users': 2000, 'posts': 50000, 'comments': 50000},
+    'large': {'users': 20000, 'posts': 500000, 'comments': 500000},
+}
+
+# Не страницы сайта; about/ — catch-all flatpages, сами страницы
+# открываются через about-author/ и about-spec/. metrics/ доступен
+# только staff и по токену.
+SKIP_PREFIXES = ('admin/', 'auth/', 'about/', '__debug__/', 'metrics/')
+PARAMETER = re.compile(r'<(?:\w+:)?(\w+)>')
+# GET-представления, меняющие данные: меряются парой, чтобы вернуть
+# базу в исходное состояние перед следующим повтором.
+PAIRED = {'profile_follow': 'profile_unfollow'}
+# Страницы, которые имеют смысл только от имени автора поста.
+AS_AUTHOR = {'post_edit'}
+QUERY = {'search': '?q=пост'}
+FLATPAGES = ('/about-author/', '/about-spec/')
+
+
+def iter_routes(patterns=None, prefix=''):
+    """(имя, шаблон маршрута) для всех именованных URL проекта."""
+    from django.urls import URLPattern, get_resolver
+
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if route.startswith(SKIP_PREFIXES):
+            continue
+        if isinstance(pattern, URLPattern):
+            if pattern.name:
+                yield pattern.name, route
+        else:
+            yield from iter_routes(pattern.url_patterns, route)
+
+
+def fixtures():
+    """Значения параметров маршрутов: самые «тяжёлые» объекты датасета."""
+    from posts.models import Group, Post, UserStats
+
+    author = (UserStats.objects.order_by('-followers_count')
+              .select_related('user').first().user)
+    post = Post.objects.filter(author=author).order_by(
+        '-comment_count').first()
+    viewer = (UserStats.objects.exclude(user=author)
+              .order_by('-following_count').select_related('user')
+              .first().user)
+    return {
+        'viewer': viewer,
+        'author': author,
+        'username': author.username,
+        'post_id': post.pk,
+        'slug': Group.objects.order_by('-posts_count').first().slug,
+    }
+
+
+def build_url(name, route, values):
+    return ('/' + PARAMETER.sub(lambda match: str(values[match[1]]), route)
+            + QUERY.get(name, ''))
+
+
+def request(client, url, cold):
+    from django.core.cache import cache
+
+    from posts.dbhooks import wrapping
+    from posts.instrumentation import RequestStats
+
+    if cold:
+        cache.clear()
+    # Запросы ко всем алиасам БД, время — по perf_counter.
+    with wrapping(RequestStats()) as stats:
+        start = time.perf_counter()
+        response = client.get(url)
+        elapsed = (time.perf_counter() - start) * 1000
+    return response.status_code, elapsed, stats.queries, stats.db_time * 1000
+
+
+def summarize(samples, status, peak):
+    timings = [sample[0] for sample in samples]
+    return {
+        'status': status,
+        'p50': round(percentile(timings, 50), 3),
+        'p95': round(percentile(timings, 95), 3),
+        'p99': round(percentile(timings, 99), 3),
+        'queries': max(sample[1] for sample in samples),
+        'sql_ms': round(sum(sample[2] for sample in samples)
+                        / len(samples), 3),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def peak_memory(client, url):
+    tracemalloc.start()
+    try:
+        client.get(url)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(repeat, cold):
+    from django.test import Client
+
+    values = fixtures()
+    viewer, author = Client(), Client()
+    viewer.force_login(values['viewer'])
+    author.force_login(values['author'])
+    routes = dict(iter_routes())
+    results = {}
+    for name, route in routes.items():
+        if name in PAIRED.values():
+            continue
+        client = author if name in AS_AUTHOR else viewer
+        url = build_url(name, route, values)
+        pair = PAIRED.get(name)
+        pair_url = pair and build_url(pair, routes[pair], values)
+        # Прогрев: шаблоны, кэш, ленивые импорты.
+        client.get(url)
+        if pair:
+            client.get(pair_url)
+        samples, pair_samples = [], []
+        for _ in range(repeat):
+            status, elapsed, count, sql = request(client, url, cold)
+            samples.append((elapsed, count, sql))
+            if pair:
+                pair_status, *sample = request(client, pair_url, cold)
+                pair_samples.append(sample)
+        results[name] = summarize(samples, status,
+                                  peak_memory(client, url))
+        if pair:
+            results[pair] = summarize(pair_samples, pair_status,
+                                      peak_memory(client, pair_url))
+    return results
+
+
+def seed_size(size):
+    from django.conf import settings
+    from django.contrib.flatpages.models import FlatPage
+
+    from posts import transfer
+    from posts.seeding import Seeder
+
+    Seeder(images=0, **SIZES[size]).run()
+    transfer.rebuild_derived()
+    # Страницы about-author/ и about-spec/ без записей FlatPage — 404.
+    for url in FLATPAGES:
+        page = FlatPage.objects.create(url=url, title=url.strip('/'),
+                                       content='<p>' + 'Текст. ' * 200)
+        page.sites.add(settings.SITE_ID)
+
+
+def calibrate():
+    """Время чисто процессорной работы, мс: мера скорости машины."""
+    return median(measure(lambda: sorted(str(i) for i in range(50000)),
+                          repeat=15))
+
+
+def compare(results, baseline, threshold, min_delta=2.0):
+    """Строки с регрессиями относительно baseline."""
+    problems = []
+    scale = 1.0
+    if 'calibration_ms' in baseline and 'calibration_ms' in results:
+        scale = results['calibration_ms'] / baseline['calibration_ms']
+    for size, views in results.items():
+        if size == 'calibration_ms':
+            continue
+        for name, current in views.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous is None:
+                continue
+            expected = previous['p95'] * scale
+            limit = max(expected * (1 + threshold), expected + min_delta)
+            if current['p95'] > limit:
+                problems.append(
+                    f'{size}/{name}: p95 {expected:.3f} -> '
+                    f'{current["p95"]} ms')
+            if current['queries'] > previous['queries']:
+                problems.append(
+                    f'{size}/{name}: запросов {previous["queries"]} -> '
+                    f'{current["queries"]}')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', nargs='+', choices=SIZES,
+                        default=['small'])
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--cold', action='store_true',
+                        help='очищать кэш перед каждым запросом')
+    parser.add_argument('--output', help='записать результаты в JSON')
+    parser.add_argument('--compare', help='baseline JSON для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help='допустимый рост p95, доля (0.5 = 50%%)')
+    parser.add_argument('--min-delta', type=float, default=2.0,
+                        help='рост p95 меньше этого, мс, не считается')
+    args = parser.parse_args()
+
+    setup_django()
+    results = {'calibration_ms': round(calibrate(), 3)}
+    for size in args.sizes:
+        with temporary_database():
+            seed_size(size)
+            results[size] = run(args.repeat, args.cold)
+        for name, row in results[size].items():
+            print(f'{size:<7}{name:<22}{row["status"]:>4} '
+                  f'p50 {row["p50"]:>8.2f}  p95 {row["p95"]:>8.2f}  '
+                  f'p99 {row["p99"]:>8.2f} ms  '
+                  f'{row["queries"]:>3} запр. {row["sql_ms"]:>7.2f} ms  '
+                  f'{row["peak_kb"]:>8.1f} KiB')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as stream:
+            problems = compare(results, json.load(stream), args.threshold,
+                               args.min_delta)
+        for problem in problems:
+            print('РЕГРЕССИЯ', problem)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
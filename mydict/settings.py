@@ -1,5 +1,8 @@
+import os
 from pathlib import Path
 
+import django
+
 import posts.apps
 
 
@@ -40,6 +43,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
 #    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'posts.instrumentation.InstrumentationMiddleware',
+    'posts.querylog.QueryLogMiddleware',
+    # Снаружи сессий: запись сессии при входе тоже «своя запись».
+    'posts.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,11 +60,21 @@ ROOT_URLCONF = 'mydict.urls'
 
 TEMPLATES_DIR = BASE_DIR / 'templates'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # Шаблоны разбираются один раз на процесс, а не на каждый запрос.
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени отрисовки для Server-Timing.
+        'BACKEND': 'posts.instrumentation.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -66,6 +83,7 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'context_processors.footer.year',
             ],
+            'loaders': TEMPLATE_LOADERS,
         },
     },
 ]
@@ -76,12 +94,48 @@ WSGI_APPLICATION = 'mydict.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite: WAL и прагмы на каждом соединении (posts.sqlite), постоянные
+# соединения. YATUBE_SQLITE_PROFILE=default — SQLite без настройки, для
+# сравнения в benchmarks/sqlite_writers.py.
+SQLITE_PROFILE = os.environ.get('YATUBE_SQLITE_PROFILE', 'tuned')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('YATUBE_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        # Ожидание блокировки — прагма busy_timeout (posts.sqlite).
+        'OPTIONS': {},
     }
 }
+if django.VERSION >= (5, 1):
+    # Транзакция сразу берёт блокировку записи: повышение чтения до
+    # записи внутри atomic() не ждёт busy_timeout и падает с «locked».
+    DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+
+# Прагмы — posts.sqlite.DEFAULTS; SQLITE_PRAGMAS заменяет их целиком.
+if SQLITE_PROFILE == 'default':
+    SQLITE_PRAGMAS = {}
+    DATABASES['default'].update(CONN_MAX_AGE=0, OPTIONS={})
+
+
+# Реплики для чтения лент (posts.routers): YATUBE_DB_REPLICAS — файлы
+# SQLite через запятую, копии основной БД. В тестах реплики зеркалят
+# default.
+DATABASE_REPLICAS = {
+    'ALIASES': [],
+    'STICKY_SECONDS': 5,
+}
+for number, name in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')),
+        start=1):
+    alias = 'replica%d' % number
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': name,
+                        'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS['ALIASES'].append(alias)
+
+DATABASE_ROUTERS = ['posts.routers.ReplicaRouter']
 
 
 # Password validation
@@ -149,12 +203,97 @@ GRAPH_MODELS = {
 
 SITE_ID = 1
 
-CACHES = {
-    'default': {
+# Кеш выбирается переменной окружения YATUBE_CACHE. LocMemCache у каждого
+# воркера свой, для нескольких процессов нужен общий: file, redis, memcached.
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION',
+                                   BASE_DIR / 'cache'),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION',
+                                   'redis://127.0.0.1:6379'),
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION',
+                                   '127.0.0.1:11211'),
+    },
 }
 
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'locmem')],
+}
+
+# Фрагменты лент инвалидируются сменой версии, TTL — лишь верхняя граница.
+FEED_CACHE_TIMEOUT = 300
+
+# Загрузки: проверка размера и заголовка картинки на лету, всё крупнее
+# FILE_UPLOAD_MAX_MEMORY_SIZE пишется во временный файл частями.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedImageUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+
+UPLOAD_LIMITS = {
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'MAX_PIXELS': 40_000_000,
+    'DOWNSCALE_TO': 2560,
+    'TRACE_MEMORY': False,
+}
+
+# Версии картинок строятся пулом потоков после сохранения поста.
+IMAGE_RENDITIONS = {
+    'WORKERS': 2,
+}
+
+# Пагинация лент: 'offset' (Paginator) или 'cursor' (keyset по pub_date, id)
+FEED_PAGINATION = 'offset'
+FEED_APPROXIMATE_TOTAL = False
+
+# Лента подписок: fan-out on write в TimelineEntry.
+# 'posts.timeline.PullTimeline' — прежняя выборка при чтении.
+FOLLOW_TIMELINE = {
+    'BACKEND': 'posts.timeline.DatabaseTimeline',
+    'MAX_ENTRIES': 1000,
+    'FANOUT_LIMIT': 5000,
+}
+
+# Метрики запросов: Server-Timing и /metrics/ для Prometheus.
+INSTRUMENTATION = {
+    'SAMPLE_RATE': float(os.environ.get('YATUBE_METRICS_SAMPLE_RATE', 1.0)),
+    'TOKEN': os.environ.get('YATUBE_METRICS_TOKEN'),
+}
+
+# Журнал медленных запросов, дублей и N+1; в тестах превышение
+# query_budget представления роняет тест (см. tests/conftest.py).
+QUERY_LOG = {
+    'ENABLED': DEBUG or bool(os.environ.get('YATUBE_QUERY_LOG')),
+    'SLOW_MS': 100,
+    'REPEAT_THRESHOLD': 5,
+}
+
+# Отложенная запись комментариев и подписок (posts.ingest): очередь в
+# отдельном файле SQLite, пачки пишет фоновый поток или flush_ingest.
+INGEST = {
+    'ENABLED': os.environ.get('YATUBE_INGEST') == '1',
+    'PATH': os.environ.get('YATUBE_INGEST_PATH',
+                           BASE_DIR / 'ingest.sqlite3'),
+    'BATCH_SIZE': 500,
+    'MAX_PENDING': 10000,
+}
+
+# Асинхронные представления лент (posts.async_views); имеют смысл
+# только при запуске через mydict.asgi.
+ASYNC_VIEWS = os.environ.get('YATUBE_ASYNC_VIEWS') == '1'
+
 CSRF_TRUSTED_ORIGINS = [
     'https://7b30-65-21-251-12.ngrok-free.app',
 ]
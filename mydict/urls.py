@@ -2,6 +2,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.contrib.flatpages import views
+from posts.instrumentation import metrics_view
 from django.urls import include, path
 from django.conf.urls import handler404, handler500
 
@@ -15,10 +16,14 @@ urlpatterns = [
          name='about-author'),
     path('about-spec/', views.flatpage, {'url': '/about-spec/'},
          name='about-spec'),
+    path('metrics/', metrics_view, name='metrics'),
+    path('api/', include('posts.api_urls')),
     path('', include('posts.urls')),
-    path('__debug__/', include('debug_toolbar.urls')),
 ]
 
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    urlpatterns.append(path('__debug__/', include('debug_toolbar.urls')))
+
 
 handler404 = 'posts.views.page_not_found' # noqa
 handler500 = 'posts.views.server_error' # noqa
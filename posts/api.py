@@ -0,0 +1,205 @@
+import functools
+import hashlib
+import json
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import condition, require_GET
+
+from .models import Comment, Group, Post, User
+from .pagination import CursorPaginator
+from .querylog import query_budget
+from .timeline import get_timeline
+
+PER_PAGE = 20
+# Ответ 304 обходится одним запросом, полный — не больше этого.
+QUERY_BUDGET = 6
+POST_FIELDS = ('id', 'text', 'pub_date', 'author__username', 'group__slug',
+               'group__title', 'comment_count', 'image', 'renditions')
+COMMENT_FIELDS = ('id', 'text', 'created', 'author__username')
+
+
+def serialize_post(row):
+    image = row.pop('image')
+    card = row.pop('renditions').get('card')
+    row['author'] = row.pop('author__username')
+    slug, title = row.pop('group__slug'), row.pop('group__title')
+    row['group'] = {'slug': slug, 'title': title} if slug else None
+    row['image'] = default_storage.url(image) if image else None
+    row['card'] = default_storage.url(card) if card else row['image']
+    return row
+
+
+def feed_payload(request, queryset):
+    """Страница ленты; строится один раз на запрос для ETag и ответа."""
+    if not hasattr(request, 'api_payload'):
+        paginator = CursorPaginator(queryset.values(*POST_FIELDS),
+                                    PER_PAGE, keys=('pub_date', 'id'))
+        page = paginator.get_page(request.GET.get('cursor'))
+        next_url = None
+        if page.has_next():
+            next_url = '%s?cursor=%s' % (request.path, page.next_cursor)
+        request.api_payload = {
+            'results': [serialize_post(row) for row in page],
+            'next': next_url,
+        }
+    return request.api_payload
+
+
+def response_body(request, payload):
+    """JSON ответа; сериализуется один раз на запрос для ETag и тела."""
+    if not hasattr(request, 'api_body'):
+        request.api_body = json.dumps(payload, cls=DjangoJSONEncoder,
+                                      sort_keys=True)
+    return request.api_body
+
+
+def json_response(request, payload):
+    return HttpResponse(response_body(request, payload),
+                        content_type='application/json')
+
+
+def feed_response(request, queryset):
+    return json_response(request, feed_payload(request, queryset))
+
+
+# Условные GET: ETag — хэш самого ответа, поэтому он не зависит от кэша
+# и одинаков во всех процессах. Ответ 304 всё равно стоит запроса
+# страницы и сериализации JSON (из неё считается хэш) — экономится
+# передача тела. Для ответа 200 страница и JSON переиспользуются.
+
+def content_etag(body):
+    return hashlib.sha1(body.encode()).hexdigest()
+
+
+def _feed_etag(queryset_func):
+    def etag(request, *args, **kwargs):
+        queryset = queryset_func(request, *args, **kwargs)
+        if queryset is None:
+            return None
+        payload = feed_payload(request, queryset)
+        return content_etag(response_body(request, payload))
+    return etag
+
+
+def _feed_last_modified(queryset_func):
+    def last_modified(request, *args, **kwargs):
+        queryset = queryset_func(request, *args, **kwargs)
+        if queryset is None:
+            return None
+        results = feed_payload(request, queryset)['results']
+        return max((row['pub_date'] for row in results), default=None)
+    return last_modified
+
+
+def api_login_required(view):
+    """Как login_required, но без редиректа на HTML-страницу входа."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'detail': 'Требуется вход'}, status=403)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _index_posts(request):
+    return Post.objects.all()
+
+
+def _group_posts(request, slug):
+    return Post.objects.filter(group__slug=slug)
+
+
+def _profile_posts(request, username):
+    return Post.objects.filter(author__username=username)
+
+
+def _follow_posts(request):
+    if not request.user.is_authenticated:
+        return None
+    return get_timeline().posts(request.user)
+
+
+def _post(request, username, post_id):
+    return Post.objects.filter(pk=post_id, author__username=username)
+
+
+def _post_last_modified(request, username, post_id):
+    # Новый комментарий тоже меняет ответ, а pub_date поста — нет.
+    dates = _post(request, username, post_id).aggregate(
+        published=Max('pub_date'), commented=Max('comments__created'))
+    return max(filter(None, dates.values()), default=None)
+
+
+@query_budget(QUERY_BUDGET)
+@require_GET
+@condition(etag_func=_feed_etag(_index_posts),
+           last_modified_func=_feed_last_modified(_index_posts))
+def index(request):
+    return feed_response(request, _index_posts(request))
+
+
+@query_budget(QUERY_BUDGET)
+@require_GET
+@condition(etag_func=_feed_etag(_group_posts),
+           last_modified_func=_feed_last_modified(_group_posts))
+def group_posts(request, slug):
+    get_object_or_404(Group, slug=slug)
+    return feed_response(request, _group_posts(request, slug))
+
+
+@query_budget(QUERY_BUDGET)
+@require_GET
+@condition(etag_func=_feed_etag(_profile_posts),
+           last_modified_func=_feed_last_modified(_profile_posts))
+def profile(request, username):
+    get_object_or_404(User, username=username)
+    return feed_response(request, _profile_posts(request, username))
+
+
+@query_budget(QUERY_BUDGET)
+@require_GET
+@api_login_required
+@condition(etag_func=_feed_etag(_follow_posts),
+           last_modified_func=_feed_last_modified(_follow_posts))
+def follow_index(request):
+    return feed_response(request, _follow_posts(request))
+
+
+def post_payload(request, username, post_id):
+    if not hasattr(request, 'api_payload'):
+        row = get_object_or_404(_post(request, username, post_id)
+                                .values(*POST_FIELDS))
+        paginator = CursorPaginator(
+            Comment.objects.filter(post=post_id).values(*COMMENT_FIELDS),
+            PER_PAGE, keys=('created', 'id'), ascending=True)
+        page = paginator.page()
+        more = None
+        if page.has_next():
+            # Продолжение отдаёт существующий JSON-фрагмент комментариев.
+            more = '%s?format=json&cursor=%s' % (
+                reverse('post_comments', args=(username, post_id)),
+                page.next_cursor)
+        comments = []
+        for comment in page:
+            comment['author'] = comment.pop('author__username')
+            comments.append(comment)
+        request.api_payload = {'post': serialize_post(row),
+                               'comments': comments, 'more_comments': more}
+    return request.api_payload
+
+
+def _post_etag(request, username, post_id):
+    payload = post_payload(request, username, post_id)
+    return content_etag(response_body(request, payload))
+
+
+@query_budget(QUERY_BUDGET)
+@require_GET
+@condition(etag_func=_post_etag, last_modified_func=_post_last_modified)
+def post_view(request, username, post_id):
+    return json_response(request, post_payload(request, username, post_id))
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import api
+
+urlpatterns = [
+    path('', api.index, name='api_index'),
+    path('group/<slug:slug>/', api.group_posts, name='api_group'),
+    path('follow/', api.follow_index, name='api_follow_index'),
+    path('<str:username>/', api.profile, name='api_profile'),
+    path('<str:username>/<int:post_id>/', api.post_view, name='api_post'),
+]
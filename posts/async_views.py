@@ -0,0 +1,124 @@
+"""Асинхронные версии лент, профиля и страницы поста для ASGI.
+
+Под ASGI синхронное представление уходит в поток целиком; здесь в поток
+уходят только пагинация и рендеринг, а независимые выборки (подписка,
+счётчики, версии кэша, комментарии) запускаются одновременно через
+asyncio.gather. Включаются настройкой ASYNC_VIEWS (см. posts/urls.py),
+контекст шаблонов тот же, что у posts.views.
+
+request.user в асинхронном коде не трогаем: его ленивая загрузка
+синхронна. Пользователь берётся один раз через auser().
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import aget_object_or_404, render
+
+from . import ingest
+from .counters import aget_user_stats
+from .feed_cache import afeed_cache_context
+from .follow_graph import ais_following
+from .forms import CommentForm
+from .models import Group, Post, User
+from .pagination import paginate
+from .querylog import query_budget
+from .routers import replica_reads
+from .timeline import get_timeline
+from .views import FEED_QUERY_BUDGET, comments_context
+
+arender = sync_to_async(render)
+apaginate = sync_to_async(paginate)
+
+
+async def auser(request):
+    """Пользователь запроса; подставляется и в request.user, чтобы
+    контекст-процессоры шаблона не загружали его второй раз."""
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+@query_budget(FEED_QUERY_BUDGET)
+@replica_reads
+async def index(request):
+    user = await auser(request)
+    (page, paginator), cache_context = await asyncio.gather(
+        apaginate(request, Post.objects.for_feed(), 10),
+        afeed_cache_context(request, user))
+    return await arender(request, 'index.html',
+                         {'page': page, 'paginator': paginator,
+                          **cache_context})
+
+
+@query_budget(FEED_QUERY_BUDGET)
+@replica_reads
+async def group_posts(request, slug):
+    user = await auser(request)
+    group, cache_context = await asyncio.gather(
+        aget_object_or_404(Group, slug=slug),
+        afeed_cache_context(request, user))
+    page, paginator = await apaginate(request, group.posts.for_feed(), 5,
+                                      count=group.posts_count)
+    return await arender(request, 'group.html',
+                         {'group': group, 'page': page,
+                          'paginator': paginator, **cache_context})
+
+
+@query_budget(FEED_QUERY_BUDGET)
+@replica_reads
+async def profile(request, username):
+    user = await auser(request)
+    profile = await aget_object_or_404(User, username=username)
+    following, stats, cache_context = await asyncio.gather(
+        ais_following(user, profile), aget_user_stats(profile),
+        afeed_cache_context(request, user))
+    page, paginator = await apaginate(request, profile.posts.for_feed(), 5,
+                                      count=stats.posts_count)
+    return await arender(request, 'profile.html', {
+        'profile': profile,
+        'stats': stats,
+        'page': page,
+        'paginator': paginator,
+        'following': following,
+        **cache_context,
+    })
+
+
+@query_budget(FEED_QUERY_BUDGET)
+@replica_reads
+async def post_view(request, username, post_id):
+    user, profile, post = await asyncio.gather(
+        auser(request),
+        aget_object_or_404(User, username=username),
+        aget_object_or_404(Post.objects.for_feed(), id=post_id,
+                           author__username=username))
+    following, stats, comments, pending = await asyncio.gather(
+        ais_following(user, profile), aget_user_stats(profile),
+        sync_to_async(comments_context)(request, username, post_id),
+        sync_to_async(ingest.pending_comments)(user, post_id))
+    return await arender(request, 'post.html', {
+        'profile': profile,
+        'stats': stats,
+        'post': post,
+        'form': CommentForm(),
+        'following': following,
+        'pending_comments': pending,
+        **comments,
+    })
+
+
+@query_budget(FEED_QUERY_BUDGET)
+@replica_reads
+@login_required
+async def follow_index(request):
+    user = await auser(request)
+    post_list = await sync_to_async(get_timeline().posts)(user)
+    (page, paginator), cache_context = await asyncio.gather(
+        apaginate(request, post_list.for_feed(), 10),
+        afeed_cache_context(request, user, 'user:%s' % user.pk))
+    return await arender(request, 'follow.html', {
+        'page': page,
+        'paginator': paginator,
+        **cache_context,
+    })
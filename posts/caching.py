@@ -0,0 +1,60 @@
+import math
+import random
+import time
+
+from django.core.cache import cache as default_cache
+
+from .instrumentation import record_cache
+
+LOCK_SUFFIX = ':lock'
+
+
+def get_or_set(key, producer, timeout, beta=1.0, lock_timeout=10,
+               wait=0.05, cache=None, metric='get_or_set'):
+    """cache.get_or_set с защитой от «стаи» при истечении ключа.
+
+    Значение хранится вместе со временем вычисления (delta) и сроком
+    годности. До истечения срока ключ пересчитывается заранее с
+    вероятностью, растущей к концу срока (XFetch, ``beta`` задаёт
+    агрессивность). Пересчёт выполняет только процесс, захвативший
+    блокировку через атомарный ``cache.add``; остальные отдают старое
+    значение или ждут нового не дольше ``lock_timeout`` секунд.
+    Попадания и промахи считаются под именем ``metric``.
+    """
+    cache = cache or default_cache
+    entry = cache.get(key)
+    now = time.time()
+    record_cache(metric, entry is not None)
+    if entry is not None:
+        value, delta, expiry = entry
+        early = delta * beta * -math.log(1.0 - random.random())
+        if now + early < expiry:
+            return value
+        # Пора пересчитать заранее; если занято — отдаём текущее.
+        if not cache.add(key + LOCK_SUFFIX, 1, lock_timeout):
+            return value
+        return _recompute(key, producer, timeout, cache)
+
+    deadline = now + lock_timeout
+    while not cache.add(key + LOCK_SUFFIX, 1, lock_timeout):
+        time.sleep(wait)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if time.time() > deadline:
+            # Владелец блокировки не успел: считаем сами.
+            return _recompute(key, producer, timeout, cache, locked=False)
+    return _recompute(key, producer, timeout, cache)
+
+
+def _recompute(key, producer, timeout, cache, locked=True):
+    try:
+        start = time.time()
+        value = producer()
+        delta = time.time() - start
+        expiry = time.time() + timeout if timeout is not None else math.inf
+        cache.set(key, (value, delta, expiry), timeout)
+        return value
+    finally:
+        if locked:
+            cache.delete(key + LOCK_SUFFIX)
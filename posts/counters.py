@@ -0,0 +1,160 @@
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def _count(queryset, field):
+    """Коррелированный подзапрос COUNT(*) по ``field`` = OuterRef('pk')."""
+    counts = (queryset.filter(**{field: OuterRef('pk')}).order_by()
+              .values(field).annotate(n=Count('pk')).values('n'))
+    return Coalesce(Subquery(counts), 0)
+
+
+def _bump(queryset, **deltas):
+    # Greatest защищает PositiveIntegerField от ухода в минус при дрейфе.
+    return queryset.update(**{
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items()
+    })
+
+
+def _user_counts(user_id):
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def _bump_user(user_id, create=True, **deltas):
+    updated = _bump(UserStats.objects.filter(user_id=user_id), **deltas)
+    if updated or not create:
+        return
+    # Строки ещё нет: считаем по таблицам, запись уже в них учтена.
+    try:
+        with transaction.atomic():
+            UserStats.objects.create(user_id=user_id,
+                                     **_user_counts(user_id))
+    except IntegrityError:
+        _bump(UserStats.objects.filter(user_id=user_id), **deltas)
+
+
+def get_user_stats(user):
+    stats = UserStats.objects.filter(user=user).first()
+    if stats is None:
+        stats, _ = UserStats.objects.get_or_create(
+            user=user, defaults=_user_counts(user.pk))
+    return stats
+
+
+async def aget_user_stats(user):
+    stats = await UserStats.objects.filter(user=user).afirst()
+    if stats is None:
+        counts = await sync_to_async(_user_counts)(user.pk)
+        stats, _ = await UserStats.objects.aget_or_create(user=user,
+                                                          defaults=counts)
+    return stats
+
+
+def post_created(post):
+    _bump_user(post.author_id, posts_count=1)
+    if post.group_id:
+        _bump(Group.objects.filter(pk=post.group_id), posts_count=1)
+
+
+# При удалении строку статистики не создаём: её посчитают заново при
+# первом чтении, а при каскадном удалении пользователя новая строка
+# ссылалась бы на удаляемую запись.
+
+def post_deleted(post):
+    _bump_user(post.author_id, create=False, posts_count=-1)
+    if post.group_id:
+        _bump(Group.objects.filter(pk=post.group_id), posts_count=-1)
+
+
+def post_group_changed(post, old_group_id):
+    if old_group_id == post.group_id:
+        return
+    if old_group_id:
+        _bump(Group.objects.filter(pk=old_group_id), posts_count=-1)
+    if post.group_id:
+        _bump(Group.objects.filter(pk=post.group_id), posts_count=1)
+
+
+def comment_created(comment):
+    _bump(Post.objects.filter(pk=comment.post_id), comment_count=1)
+
+
+def comment_deleted(comment):
+    _bump(Post.objects.filter(pk=comment.post_id), comment_count=-1)
+
+
+def comments_created(post_counts):
+    """Пачка комментариев: {post_id: число новых}."""
+    for post_id, count in post_counts.items():
+        _bump(Post.objects.filter(pk=post_id), comment_count=count)
+
+
+def follow_created(follow):
+    _bump_user(follow.author_id, followers_count=1)
+    _bump_user(follow.user_id, following_count=1)
+
+
+def follows_created(follows):
+    """Пачка подписок: один UPDATE на пользователя, а не на подписку."""
+    followers = Counter(follow.author_id for follow in follows)
+    following = Counter(follow.user_id for follow in follows)
+    for user_id in followers.keys() | following.keys():
+        deltas = {'followers_count': followers[user_id],
+                  'following_count': following[user_id]}
+        _bump_user(user_id, **{field: delta for field, delta in
+                               deltas.items() if delta})
+
+
+def follow_deleted(follow):
+    _bump_user(follow.author_id, create=False, followers_count=-1)
+    _bump_user(follow.user_id, create=False, following_count=-1)
+
+
+@transaction.atomic
+def reconcile(users=None, groups=None):
+    """Пересчитывает счётчики пакетными UPDATE по подзапросам.
+
+    С ``users`` или ``groups`` — только счётчики этих пользователей и
+    групп (после импорта); комментарии постов тогда не пересчитываются.
+    """
+    scoped = users is not None or groups is not None
+    result = {}
+    if not scoped or users is not None:
+        missing = User.objects.filter(stats__isnull=True)
+        stats = UserStats.objects.all()
+        if users is not None:
+            missing = missing.filter(pk__in=users)
+            stats = stats.filter(user__in=users)
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk)
+             for pk in missing.values_list('pk', flat=True)],
+            batch_size=1000, ignore_conflicts=True)
+        result['users'] = stats.update(
+            posts_count=_count(Post.objects, 'author'),
+            followers_count=_count(Follow.objects, 'author'),
+            following_count=_count(Follow.objects, 'user'),
+        )
+    if not scoped or groups is not None:
+        queryset = Group.objects.all()
+        if groups is not None:
+            queryset = queryset.filter(pk__in=groups)
+        result['groups'] = queryset.update(
+            posts_count=_count(Post.objects, 'group'))
+    if not scoped:
+        result['posts'] = Post.objects.update(
+            comment_count=_count(Comment.objects, 'post'))
+    return result
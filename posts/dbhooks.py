@@ -0,0 +1,44 @@
+"""Обёртки запросов к БД, которые видят и асинхронный ORM.
+
+connections в Django свои у каждого потока: connection.execute_wrapper,
+поставленный в потоке цикла событий, не видит запросов асинхронных
+представлений — ORM выполняет их в потоке sync_to_async. Поэтому на
+каждое соединение при создании ставится одна постоянная обёртка, а
+активные обработчики хранятся в contextvar: sync_to_async копирует
+контекст в свой поток.
+"""
+import contextlib
+import contextvars
+import functools
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_active = contextvars.ContextVar('db_wrappers', default=())
+
+
+def dispatch(execute, sql, params, many, context):
+    wrappers = _active.get()
+    # Как у Django: первый добавленный обработчик — внешний.
+    for wrapper in reversed(wrappers):
+        execute = functools.partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install(sender, connection, **kwargs):
+    # В начало списка: connection.execute_wrapper снимает свою обёртку
+    # через pop(), и соединение, открытое внутри такого блока, не
+    # должно её подменить.
+    if dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, dispatch)
+
+
+@contextlib.contextmanager
+def wrapping(wrapper):
+    """execute_wrapper для всех соединений текущего контекста."""
+    token = _active.set(_active.get() + (wrapper,))
+    try:
+        yield wrapper
+    finally:
+        _active.reset(token)
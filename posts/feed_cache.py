@@ -0,0 +1,61 @@
+import asyncio
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'feed:version:%s'
+
+
+def get_version(scope='all'):
+    return cache.get_or_set(VERSION_KEY % scope, 1, None)
+
+
+def bump_version(scope='all'):
+    """Инвалидирует все фрагменты области сменой версии в ключе."""
+    key = VERSION_KEY % scope
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+async def aget_version(scope='all'):
+    return await cache.aget_or_set(VERSION_KEY % scope, 1, None)
+
+
+def _build_key(request, user, version, scope=None, scope_version=None):
+    parts = ['v%s' % version]
+    if scope:
+        parts.append('%s.v%s' % (scope, scope_version))
+    parts.append('u%s' % user.pk if user.is_authenticated else 'anon')
+    parts.append('p%s' % request.GET.get('page', ''))
+    parts.append('c%s' % request.GET.get('cursor', ''))
+    return ':'.join(parts)
+
+
+def feed_cache_key(request, scope=None):
+    """Ключ фрагмента ленты: версия контента, зритель, страница/курсор.
+
+    Зритель входит в ключ всегда: в карточке поста есть ссылка
+    «Edit», которая видна только автору.
+    """
+    return _build_key(request, request.user, get_version(), scope,
+                      get_version(scope) if scope else None)
+
+
+def feed_cache_context(request, scope=None):
+    return {
+        'feed_cache_key': feed_cache_key(request, scope),
+        'feed_cache_timeout': getattr(settings, 'FEED_CACHE_TIMEOUT', 300),
+    }
+
+
+async def afeed_cache_context(request, user, scope=None):
+    """Как feed_cache_context; ``user`` — уже загруженный request.auser()."""
+    versions = [aget_version()] + ([aget_version(scope)] if scope else [])
+    versions = await asyncio.gather(*versions)
+    return {
+        'feed_cache_key': _build_key(request, user, versions[0], scope,
+                                     versions[1] if scope else None),
+        'feed_cache_timeout': getattr(settings, 'FEED_CACHE_TIMEOUT', 300),
+    }
@@ -0,0 +1,145 @@
+"""Проверки «подписан ли пользователь на автора» без выгрузки подписок.
+
+Для пользователя с умеренным числом подписок множество id авторов
+кэшируется целиком, и проверки идут по нему. Если подписок больше
+SET_LIMIT, в кэш кладётся пометка, и каждая проверка — индексированный
+EXISTS по UniqueConstraint(user, author). Изменения подписок меняют
+поколение в ключе кэша пользователя (см. posts.signals): множество,
+прочитанное до изменения и записанное после, ляжет под старый ключ.
+Подписки, ждущие в очереди posts.ingest, считаются уже оформленными.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import ingest
+from .models import Follow
+
+DEFAULTS = {
+    # Больше подписок — множество не кэшируется, работаем через EXISTS.
+    'SET_LIMIT': 5000,
+    'TIMEOUT': 3600,
+}
+
+CACHE_KEY = 'follows:%s:g%s'
+GENERATION_KEY = 'follows:gen:%s'
+# Пометка в кэше: подписок слишком много для множества.
+TOO_MANY = 'many'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FOLLOW_GRAPH', {})}
+
+
+def _user_id(user):
+    return getattr(user, 'pk', user)
+
+
+def _ids_query(user_id, config):
+    return (Follow.objects.filter(user_id=user_id)
+            .values_list('author_id', flat=True)[:config['SET_LIMIT'] + 1])
+
+
+def _to_cached(ids, config):
+    return TOO_MANY if len(ids) > config['SET_LIMIT'] else frozenset(ids)
+
+
+def cache_key(user_id):
+    return CACHE_KEY % (user_id,
+                        cache.get_or_set(GENERATION_KEY % user_id, 1, None))
+
+
+async def acache_key(user_id):
+    generation = await cache.aget_or_set(GENERATION_KEY % user_id, 1, None)
+    return CACHE_KEY % (user_id, generation)
+
+
+def following_ids(user):
+    """frozenset id авторов или None, если подписок больше SET_LIMIT."""
+    user_id = _user_id(user)
+    key = cache_key(user_id)
+    cached = cache.get(key)
+    if cached is None:
+        config = get_config()
+        cached = _to_cached(list(_ids_query(user_id, config)), config)
+        cache.set(key, cached, config['TIMEOUT'])
+    return None if cached == TOO_MANY else cached
+
+
+async def afollowing_ids(user):
+    user_id = _user_id(user)
+    key = await acache_key(user_id)
+    cached = await cache.aget(key)
+    if cached is None:
+        config = get_config()
+        cached = _to_cached([pk async for pk in _ids_query(user_id, config)],
+                            config)
+        await cache.aset(key, cached, config['TIMEOUT'])
+    return None if cached == TOO_MANY else cached
+
+
+def _pair(user, author):
+    """(user_id, author_id) или None, если проверка заведомо ложна."""
+    if user is None or not getattr(user, 'is_authenticated', True):
+        return None
+    user_id, author_id = _user_id(user), _user_id(author)
+    return None if user_id == author_id else (user_id, author_id)
+
+
+def is_following(user, author):
+    pair = _pair(user, author)
+    if pair is None:
+        return False
+    if ingest.enabled() and pair[1] in ingest.pending_follows(pair[0]):
+        return True
+    ids = following_ids(pair[0])
+    if ids is not None:
+        return pair[1] in ids
+    return Follow.objects.filter(user_id=pair[0],
+                                 author_id=pair[1]).exists()
+
+
+async def ais_following(user, author):
+    pair = _pair(user, author)
+    if pair is None:
+        return False
+    if ingest.enabled() and pair[1] in await sync_to_async(
+            ingest.pending_follows)(pair[0]):
+        return True
+    ids = await afollowing_ids(pair[0])
+    if ids is not None:
+        return pair[1] in ids
+    return await Follow.objects.filter(user_id=pair[0],
+                                       author_id=pair[1]).aexists()
+
+
+def following_many(user, authors):
+    """Подмножество id из ``authors``, на которые подписан ``user``."""
+    author_ids = {_user_id(author) for author in authors}
+    if (user is None or not getattr(user, 'is_authenticated', True)
+            or not author_ids):
+        return set()
+    pending = author_ids & ingest.pending_follows(_user_id(user))
+    ids = following_ids(user)
+    if ids is not None:
+        return (author_ids & ids) | pending
+    return pending | set(
+        Follow.objects.filter(user=user, author__in=author_ids)
+        .values_list('author_id', flat=True))
+
+
+def _next_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def invalidate(user):
+    """Новое поколение сейчас и после коммита: читатель, успевший
+    между ними загрузить ещё старые подписки, тоже не останется в кэше.
+    """
+    key = GENERATION_KEY % _user_id(user)
+    _next_generation(key)
+    transaction.on_commit(lambda: _next_generation(key))
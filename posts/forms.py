@@ -1,5 +1,12 @@
+import time
+import tracemalloc
+
 from django import forms
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+
+from .metrics import metrics
 from .models import Post, Comment
+from .uploads import downscale, get_limits
 
 
 class PostForm(forms.ModelForm):
@@ -7,6 +14,37 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ['group', 'text', 'image']
 
+    def __init__(self, *args, rejected_uploads=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rejected_uploads = rejected_uploads or {}
+
+    def clean_image(self):
+        if 'image' in self.rejected_uploads:
+            raise forms.ValidationError(self.rejected_uploads['image'])
+        image = self.cleaned_data.get('image')
+        limits = get_limits()
+        if not isinstance(image, UploadedFile) or not limits['DOWNSCALE_TO']:
+            return image
+        started = time.perf_counter()
+        tracing = limits.get('TRACE_MEMORY') and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        try:
+            result = downscale(image, limits['DOWNSCALE_TO'])
+        finally:
+            if tracing:
+                metrics.observe('upload_peak_memory_bytes',
+                                tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+        metrics.observe('upload_process_seconds',
+                        time.perf_counter() - started)
+        if result is None:
+            return image
+        content, fmt = result
+        metrics.inc('upload_downscaled_total')
+        return SimpleUploadedFile(image.name, content,
+                                  content_type='image/%s' % fmt.lower())
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,415 @@
+"""Отложенная запись комментариев и подписок при всплесках нагрузки.
+
+С INGEST['ENABLED'] представления add_comment и profile_follow не пишут
+в БД, а добавляют запись в локальную очередь — отдельный файл SQLite в
+режиме WAL, который переживает перезапуск процесса. Писатель (фоновый
+поток или команда flush_ingest) забирает пачку, вставляет её
+bulk_create в одной транзакции и делает то, что для одиночной записи
+делают сигналы: счётчики, ленты подписок, версии кэша.
+
+Пока запись в очереди, её автор уже видит свой комментарий (с пометкой
+«отправляется») и кнопку «Отписаться». Отписка от подписки, которую
+писатель уже взял в пачку, кладёт в очередь отмену: писатель удалит
+Follow после записи. Очередь ограничена MAX_PENDING: при переполнении
+представления отвечают 503 с Retry-After.
+
+Доставка — «хотя бы один раз»: пачка берётся в аренду на LEASE секунд
+и удаляется из очереди после коммита. Если писатель упал между коммитом
+и удалением, пачку повторит другой; подписки при этом не задвоятся
+(UniqueConstraint), комментарий — может.
+"""
+import contextlib
+import datetime as dt
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+
+from . import counters, follow_graph
+from .feed_cache import bump_version
+from .metrics import metrics
+from .models import Comment, Follow, Post
+from .routers import note_write
+from .timeline import get_timeline
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+DEFAULTS = {
+    'ENABLED': False,
+    'PATH': 'ingest.sqlite3',
+    'BATCH_SIZE': 500,
+    # Больше записей в очереди — новые отклоняются с 503.
+    'MAX_PENDING': 10000,
+    # Пауза писателя, когда очередь пуста, секунды.
+    'FLUSH_INTERVAL': 0.2,
+    # Через сколько секунд взятая, но не удалённая пачка снова доступна.
+    'LEASE': 30,
+    'RETRY_AFTER': 5,
+    # Писатель в фоновом потоке процесса; False — только flush_ingest.
+    'BACKGROUND': True,
+}
+
+COMMENT = 'comment'
+FOLLOW = 'follow'
+# Отмена подписки, взятой писателем раньше отписки.
+UNFOLLOW = 'unfollow'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    target_id INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    claimed REAL
+);
+CREATE INDEX IF NOT EXISTS queue_owner ON queue (kind, user_id, target_id);
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'INGEST', {})}
+
+
+def enabled():
+    return get_config()['ENABLED']
+
+
+@contextlib.contextmanager
+def _immediate(connection):
+    # Блокировка записи с начала транзакции: проверка глубины и вставка,
+    # выборка и аренда не разделяются чужой записью.
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield connection
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+class IngestQueue:
+    """Очередь в файле SQLite; своё соединение у каждого потока."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.executescript(SCHEMA)
+            self.local.connection = connection
+        return connection
+
+    def depth(self):
+        return self.connection().execute(
+            'SELECT count(*) FROM queue').fetchone()[0]
+
+    def append(self, kind, user_id, target_id, payload=None, limit=None):
+        with _immediate(self.connection()) as connection:
+            if limit is not None and self.depth() >= limit:
+                raise QueueFull
+            return connection.execute(
+                'INSERT INTO queue (kind, user_id, target_id, payload, '
+                'created) VALUES (?, ?, ?, ?, ?)',
+                (kind, user_id, target_id, json.dumps(payload or {}),
+                 time.time())).lastrowid
+
+    def pending(self, kind, user_id, target_id=None):
+        """[(target_id, payload, created)] записей пользователя."""
+        query = ('SELECT target_id, payload, created FROM queue '
+                 'WHERE kind = ? AND user_id = ?')
+        params = [kind, user_id]
+        if target_id is not None:
+            query += ' AND target_id = ?'
+            params.append(target_id)
+        return [(target, json.loads(payload), created) for
+                target, payload, created in self.connection().execute(
+                    query + ' ORDER BY id', params)]
+
+    def latest(self, kinds, user_id):
+        """{target_id: kind} — последняя по порядку запись о каждой цели."""
+        marks = ', '.join('?' * len(kinds))
+        return dict(self.connection().execute(
+            f'SELECT target_id, kind FROM queue WHERE user_id = ? '
+            f'AND kind IN ({marks}) ORDER BY id', [user_id, *kinds]))
+
+    def discard(self, kind, user_id, target_id, lease):
+        """Удаляет свободные записи; возвращает число взятых писателем."""
+        owner = (kind, user_id, target_id)
+        with _immediate(self.connection()) as connection:
+            connection.execute(
+                'DELETE FROM queue WHERE kind = ? AND user_id = ? '
+                'AND target_id = ? AND (claimed IS NULL OR claimed < ?)',
+                owner + (time.time() - lease,))
+            return connection.execute(
+                'SELECT count(*) FROM queue WHERE kind = ? AND user_id = ? '
+                'AND target_id = ?', owner).fetchone()[0]
+
+    def claim(self, limit, lease):
+        """Берёт в аренду до ``limit`` самых старых свободных записей."""
+        now = time.time()
+        with _immediate(self.connection()) as connection:
+            rows = connection.execute(
+                'SELECT id, kind, user_id, target_id, payload, created '
+                'FROM queue WHERE claimed IS NULL OR claimed < ? '
+                'ORDER BY id LIMIT ?', (now - lease, limit)).fetchall()
+            connection.executemany(
+                'UPDATE queue SET claimed = ? WHERE id = ?',
+                [(now, row[0]) for row in rows])
+        return rows
+
+    def release(self, ids):
+        """Возвращает в очередь пачку, которую не удалось записать."""
+        with _immediate(self.connection()) as connection:
+            connection.executemany(
+                'UPDATE queue SET claimed = NULL WHERE id = ?',
+                [(pk,) for pk in ids])
+
+    def ack(self, ids):
+        with _immediate(self.connection()) as connection:
+            connection.executemany('DELETE FROM queue WHERE id = ?',
+                                   [(pk,) for pk in ids])
+
+    def close(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue():
+    path = str(get_config()['PATH'])
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = IngestQueue(path)
+        return _queues[path]
+
+
+def _enqueue(kind, user_id, target_id, payload=None):
+    config = get_config()
+    try:
+        get_queue().append(kind, user_id, target_id, payload,
+                           limit=config['MAX_PENDING'])
+    except QueueFull:
+        metrics.inc('ingest_rejected_total', kind=kind)
+        raise
+    metrics.inc('ingest_enqueued_total', kind=kind)
+    # После сброса очереди запись читается из БД: клиент должен читать
+    # с основной, пока реплика не догнала.
+    note_write()
+    if config['BACKGROUND']:
+        start_writer()
+
+
+def enqueue_comment(user, post, text):
+    _enqueue(COMMENT, user.pk, post.pk, {'text': text})
+
+
+def enqueue_follow(user, author):
+    _enqueue(FOLLOW, user.pk, author.pk)
+
+
+def cancel_follow(user, author):
+    """Отписка раньше, чем подписка дошла до БД.
+
+    Если подписка уже в пачке писателя, её Follow может появиться после
+    отписки: в очередь кладётся отмена, и писатель удалит Follow после
+    записи. Отмена не ограничена MAX_PENDING — её нельзя отклонить.
+    """
+    if not enabled():
+        return
+    config = get_config()
+    queue = get_queue()
+    if queue.discard(FOLLOW, user.pk, author.pk, config['LEASE']):
+        queue.append(UNFOLLOW, user.pk, author.pk)
+        if config['BACKGROUND']:
+            start_writer()
+
+
+def pending_comments(user, post_id):
+    """Свои комментарии к посту, ещё не записанные в БД."""
+    if not enabled() or not user.is_authenticated:
+        return []
+    return [{'text': payload['text'],
+             'created': dt.datetime.fromtimestamp(created, dt.timezone.utc)}
+            for _, payload, created in
+            get_queue().pending(COMMENT, user.pk, post_id)]
+
+
+def pending_follows(user_id):
+    """id авторов, подписка на которых ещё в очереди."""
+    if not enabled():
+        return set()
+    latest = get_queue().latest((FOLLOW, UNFOLLOW), user_id)
+    return {target for target, kind in latest.items() if kind == FOLLOW}
+
+
+def busy_response():
+    response = HttpResponse('Слишком много запросов, повторите позже',
+                            status=503)
+    response['Retry-After'] = get_config()['RETRY_AFTER']
+    return response
+
+
+def write_comments(items):
+    """items: [(user_id, post_id, payload)]; возвращает число записей."""
+    post_ids = set(Post.objects.filter(
+        pk__in={post_id for _, post_id, _ in items}).values_list(
+        'pk', flat=True))
+    user_ids = set(User.objects.filter(
+        pk__in={user_id for user_id, _, _ in items}).values_list(
+        'pk', flat=True))
+    # Пост или автор могли быть удалены, пока запись ждала в очереди.
+    comments = Comment.objects.bulk_create([
+        Comment(post_id=post_id, author_id=user_id, text=payload['text'])
+        for user_id, post_id, payload in items
+        if post_id in post_ids and user_id in user_ids])
+    counters.comments_created(Counter(item.post_id for item in comments))
+    return len(comments)
+
+
+def write_follows(items):
+    """items: [(user_id, author_id)]; возвращает созданные Follow."""
+    pairs = dict.fromkeys(pair for pair in items if pair[0] != pair[1])
+    users = User.objects.in_bulk({pk for pair in pairs for pk in pair})
+    existing = set(Follow.objects.filter(
+        user_id__in={user for user, _ in pairs},
+        author_id__in={author for _, author in pairs}).values_list(
+        'user_id', 'author_id'))
+    follows = [Follow(user=users[user], author=users[author])
+               for user, author in pairs
+               if (user, author) not in existing
+               and user in users and author in users]
+    try:
+        with transaction.atomic():
+            Follow.objects.bulk_create(follows)
+    except IntegrityError:
+        # Часть пар успела записать одиночная подписка: ignore_conflicts
+        # вернул бы и отброшенные строки, поэтому поштучно — в счётчики и
+        # ленты идут только действительно созданные.
+        follows = [follow for follow, created in (
+            Follow.objects.get_or_create(user=follow.user,
+                                         author=follow.author)
+            for follow in follows) if created]
+    counters.follows_created(follows)
+    timeline = get_timeline()
+    for follow in follows:
+        timeline.backfill(follow.user, follow.author)
+    for user_id in {follow.user_id for follow in follows}:
+        follow_graph.invalidate(user_id)
+    return follows
+
+
+def write_unfollows(pairs):
+    """pairs: [(user_id, author_id)] отмен; возвращает число удалённых.
+
+    Отмены редки, поэтому Follow удаляются поштучно: счётчики, ленты и
+    кэш обновляют сигналы post_delete, как при обычной отписке.
+    """
+    condition = Q()
+    for user_id, author_id in pairs:
+        condition |= Q(user_id=user_id, author_id=author_id)
+    follows = list(Follow.objects.filter(condition))
+    for follow in follows:
+        follow.delete()
+    return len(follows)
+
+
+def flush(batch_size=None):
+    """Записывает одну пачку из очереди; возвращает её размер."""
+    config = get_config()
+    queue = get_queue()
+    rows = queue.claim(batch_size or config['BATCH_SIZE'], config['LEASE'])
+    if not rows:
+        return 0
+    start = time.perf_counter()
+    comments = [(user_id, target_id, json.loads(payload))
+                for _, kind, user_id, target_id, payload, _ in rows
+                if kind == COMMENT]
+    # Для пары важна последняя запись: отмена после подписки или новая
+    # подписка после отмены.
+    latest = {(user_id, target_id): kind
+              for _, kind, user_id, target_id, _, _ in rows
+              if kind in (FOLLOW, UNFOLLOW)}
+    follows = [pair for pair, kind in latest.items() if kind == FOLLOW]
+    unfollows = [pair for pair, kind in latest.items() if kind == UNFOLLOW]
+    try:
+        with transaction.atomic():
+            written = write_comments(comments) if comments else 0
+            created = write_follows(follows) if follows else []
+            if unfollows:
+                write_unfollows(unfollows)
+    except Exception:
+        # Не держим аренду до LEASE: отписка ждёт взятые подписки.
+        queue.release([row[0] for row in rows])
+        raise
+    if written:
+        bump_version()
+    for user_id in {follow.user_id for follow in created}:
+        bump_version('user:%s' % user_id)
+    queue.ack([row[0] for row in rows])
+    now = time.time()
+    metrics.observe('ingest_flush_seconds', time.perf_counter() - start)
+    metrics.observe('ingest_batch_size', len(rows))
+    metrics.observe('ingest_lag_seconds', now - min(row[5] for row in rows))
+    metrics.inc('ingest_flushed_total', written, kind=COMMENT)
+    metrics.inc('ingest_flushed_total', len(created), kind=FOLLOW)
+    return len(rows)
+
+
+def run_writer(stop=None):
+    """Цикл писателя: пачка за пачкой, пауза на пустой очереди."""
+    interval = get_config()['FLUSH_INTERVAL']
+    while stop is None or not stop.is_set():
+        try:
+            done = flush()
+        except Exception:
+            logger.exception('Не удалось записать пачку из очереди')
+            done = 0
+        finally:
+            close_old_connections()
+        if not done:
+            time.sleep(interval)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def start_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=run_writer, daemon=True,
+                                       name='ingest-writer')
+            _writer.start()
+
+
+# Глубина очереди — общая для всех процессов, читается при сборе метрик.
+metrics.gauge('ingest_queue_depth',
+              lambda: get_queue().depth() if enabled() else 0)
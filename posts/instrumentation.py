@@ -0,0 +1,224 @@
+"""Лёгкие метрики запросов: время, SQL, шаблоны и кэш.
+
+Middleware замеряет выборку запросов (INSTRUMENTATION['SAMPLE_RATE']),
+отдаёт итоги в заголовке Server-Timing и копит сводки в posts.metrics,
+откуда их забирает /metrics/ в текстовом формате Prometheus.
+"""
+import contextvars
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.template.backends import django as django_backend
+
+from .dbhooks import wrapping
+from .metrics import metrics
+
+DEFAULTS = {
+    # Доля замеряемых запросов: 0 — выключено, 1 — каждый.
+    'SAMPLE_RATE': 1.0,
+    'SERVER_TIMING': True,
+    # Токен для /metrics/ (заголовок Authorization: Bearer ...); без него
+    # метрики видят только staff.
+    'TOKEN': None,
+}
+
+_current = contextvars.ContextVar('instrumentation', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'INSTRUMENTATION', {})}
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper: видит каждый запрос к БД.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+def current():
+    """Статистика текущего замеряемого запроса или None."""
+    return _current.get()
+
+
+def record_cache(name, hit):
+    metrics.inc('cache_requests_total', cache=name,
+                result='hit' if hit else 'miss')
+    stats = _current.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+class TimedTemplate(django_backend.Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        # Вложенные render_to_string уже входят во время внешнего шаблона.
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд шаблонов проекта: время отрисовки идёт в RequestStats.
+
+    Сигнал template_rendered отправляется только в тестах, поэтому
+    время замеряет обёртка над шаблонами самого бэкенда.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class InstrumentationMiddleware:
+    # Под ASGI асинхронные представления вызываются без лишнего
+    # перехода в поток: middleware умеет оба режима.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        config = get_config()
+        if random.random() >= config['SAMPLE_RATE']:
+            return self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with wrapping(stats):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, start, config)
+
+    async def __acall__(self, request):
+        config = get_config()
+        if random.random() >= config['SAMPLE_RATE']:
+            return await self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with wrapping(stats):
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, start, config)
+
+    def finish(self, request, response, stats, start, config):
+        total = time.perf_counter() - start
+        self.record(request, response, stats, total)
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = server_timing(stats, total)
+        return response
+
+    def record(self, request, response, stats, total):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.inc('http_requests_total', view=view,
+                    status=response.status_code)
+        metrics.observe('http_request_seconds', total, view=view)
+        metrics.observe('db_queries', stats.queries, view=view)
+        metrics.observe('db_seconds', stats.db_time, view=view)
+        metrics.observe('template_seconds', stats.template_time, view=view)
+
+
+def server_timing(stats, total):
+    parts = [
+        'db;dur=%.1f;desc="%d queries"' % (stats.db_time * 1000,
+                                          stats.queries),
+        'tpl;dur=%.1f' % (stats.template_time * 1000),
+    ]
+    lookups = stats.cache_hits + stats.cache_misses
+    if lookups:
+        parts.append('cache;desc="%d/%d hits"' % (stats.cache_hits,
+                                                   lookups))
+    parts.append('total;dur=%.1f' % (total * 1000))
+    return ', '.join(parts)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\')
+                     .replace('"', '\\"')) for name, value in labels)
+
+
+def _family(lines, name, kind, samples):
+    """Метрика одного типа: строка # TYPE и её значения."""
+    lines.append('# TYPE %s %s' % (name, kind))
+    for suffix, labels, value in samples:
+        lines.append('%s%s%s %s' % (name, suffix, _labels(labels), value))
+
+
+def render_metrics():
+    counters, summaries = metrics.snapshot()
+    families = {}
+    for (name, labels), value in counters.items():
+        families.setdefault((name, 'counter'), []).append(
+            ('', labels, value))
+    for (name, labels), (count, total, peak) in summaries.items():
+        families.setdefault((name, 'summary'), []).extend(
+            [('_sum', labels, total), ('_count', labels, count)])
+        # Максимум — отдельный gauge: в summary есть только квантили.
+        families.setdefault((name + '_max', 'gauge'), []).append(
+            ('', labels, peak))
+    for (name, labels), value in metrics.collect_gauges().items():
+        families.setdefault((name, 'gauge'), []).append(('', labels, value))
+    lines = []
+    for (name, kind), samples in sorted(families.items()):
+        _family(lines, name, kind,
+                sorted(samples, key=lambda s: (s[0], str(s[1]))))
+    return '\n'.join(lines) + '\n'
+
+
+def allowed(request):
+    # Только staff или токен: за обратным прокси на той же машине
+    # REMOTE_ADDR у всех запросов 127.0.0.1, INTERNAL_IPS не защищает.
+    token = get_config()['TOKEN']
+    if token and request.headers.get('Authorization') == f'Bearer {token}':
+        return True
+    return request.user.is_staff
+
+
+def metrics_view(request):
+    if not allowed(request):
+        raise Http404
+    return HttpResponse(render_metrics(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,72 @@
+import csv
+import struct
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Follow
+
+# Пара (user_id, author_id) — два беззнаковых 32-битных little-endian.
+EDGE = struct.Struct('<II')
+
+
+class Command(BaseCommand):
+    help = ('Выгружает граф подписок (user_id, author_id) в CSV или '
+            'компактный бинарный формат, не загружая таблицу в память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help="файл или '-' для stdout")
+        parser.add_argument('--format', choices=('csv', 'binary'),
+                            default='csv',
+                            help='binary — пары uint32 <II без заголовка')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        # iterator() на PostgreSQL читает серверным курсором; порядок
+        # совпадает с индексом unique_follow (user, author).
+        edges = (Follow.objects.order_by('user_id', 'author_id')
+                 .values_list('user_id', 'author_id')
+                 .iterator(chunk_size=options['chunk_size']))
+        binary = options['format'] == 'binary'
+        to_stdout = options['path'] == '-'
+        if to_stdout:
+            stream = sys.stdout.buffer if binary else sys.stdout
+        else:
+            stream = (open(options['path'], 'wb') if binary else
+                      open(options['path'], 'w', newline=''))
+        start = time.perf_counter()
+        try:
+            written = (self.write_binary(stream, edges) if binary
+                       else self.write_csv(stream, edges))
+        finally:
+            if not to_stdout:
+                stream.close()
+        elapsed = time.perf_counter() - start
+        report = self.stderr if to_stdout else self.stdout
+        report.write(f'Рёбер: {written}, {elapsed:.1f} с, '
+                     f'{written / max(elapsed, 1e-9):.0f} строк/с')
+
+    def write_csv(self, stream, edges):
+        writer = csv.writer(stream)
+        writer.writerow(('user_id', 'author_id'))
+        written = 0
+        for written, edge in enumerate(edges, 1):
+            writer.writerow(edge)
+        return written
+
+    def write_binary(self, stream, edges):
+        written = 0
+        buffer = bytearray()
+        for written, (user_id, author_id) in enumerate(edges, 1):
+            try:
+                buffer += EDGE.pack(user_id, author_id)
+            except struct.error:
+                raise CommandError(
+                    f'id {max(user_id, author_id)} не помещается в uint32')
+            if len(buffer) >= 1 << 16:
+                stream.write(buffer)
+                buffer.clear()
+        stream.write(buffer)
+        return written
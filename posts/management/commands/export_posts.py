@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты в JSONL/CSV потоком, не читая таблицу целиком'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help="файл или '-' для stdout")
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help='по умолчанию — по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or (
+            'csv' if options['path'].endswith('.csv') else 'jsonl')
+        start = time.perf_counter()
+        exported = 0
+
+        def counted(rows):
+            nonlocal exported
+            for exported, row in enumerate(rows, 1):
+                yield row
+
+        rows = counted(transfer.export_rows(
+            chunk_size=options['chunk_size']))
+        if options['path'] == '-':
+            transfer.write_rows(self.stdout, rows, fmt)
+            report = self.stderr
+        else:
+            with open(options['path'], 'w', encoding='utf-8',
+                      newline='') as stream:
+                transfer.write_rows(stream, rows, fmt)
+            report = self.stdout
+        elapsed = time.perf_counter() - start
+        report.write(
+            f'Выгружено: {exported}, {elapsed:.1f} с, '
+            f'{exported / max(elapsed, 1e-9):.0f} строк/с')
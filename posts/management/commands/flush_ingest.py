@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import ingest
+
+
+class Command(BaseCommand):
+    help = 'Пишет в БД комментарии и подписки из очереди posts.ingest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='разобрать очередь и выйти')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        if not options['once']:
+            self.stdout.write('Писатель очереди запущен, Ctrl+C — выход')
+            try:
+                ingest.run_writer()
+            except KeyboardInterrupt:
+                pass
+            return
+        total = 0
+        while True:
+            done = ingest.flush(options['batch_size'])
+            if not done:
+                break
+            total += done
+        self.stdout.write(self.style.SUCCESS(f'Записано из очереди: {total}'))
@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import renditions
+from posts.models import Post
+
+
+def _generate(post_id):
+    try:
+        return bool(renditions.generate(post_id))
+    except Exception as error:
+        return error
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Строит версии картинок для уже загруженных постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--all', action='store_true',
+                            help='перестроить и уже готовые версии')
+
+    def handle(self, *args, **options):
+        posts = (Post.objects.exclude(image='').exclude(image__isnull=True)
+                 .values_list('pk', 'renditions'))
+        post_ids = [
+            pk for pk, done in posts.iterator()
+            # 'card' пишется последним — по нему судим о готовности.
+            if options['all'] or 'card' not in (done or {})
+        ]
+        start = time.perf_counter()
+        built = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for post_id, result in zip(post_ids,
+                                       pool.map(_generate, post_ids)):
+                if isinstance(result, Exception):
+                    failed += 1
+                    self.stderr.write(f'Пост {post_id}: {result}')
+                elif result:
+                    built += 1
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {built}, ошибок: {failed}, {elapsed:.1f} с'))
@@ -0,0 +1,61 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Импортирует посты из JSONL/CSV пачками через bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="файл или '-' для stdin")
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help='по умолчанию — по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--create-missing', action='store_true',
+                            help='создавать неизвестных авторов и группы')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='не пересобирать счётчики, поиск и ленты')
+        parser.add_argument('--full-rebuild', action='store_true',
+                            help='пересобрать счётчики, поиск и ленты '
+                                 'целиком, а не только затронутые импортом')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or (
+            'csv' if options['path'].endswith('.csv') else 'jsonl')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        start = time.perf_counter()
+        scope = transfer.ImportScope()
+
+        def on_error(line, error):
+            self.stderr.write(f'Запись {line}: {error}')
+
+        def on_batch(imported, skipped):
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f'{imported} постов, '
+                    f'{imported / (time.perf_counter() - start):.0f} строк/с')
+
+        if options['path'] == '-':
+            imported, skipped = transfer.import_posts(
+                transfer.read_rows(sys.stdin, fmt), options['batch_size'],
+                options['create_missing'], on_error, on_batch, scope)
+        else:
+            with open(options['path'], encoding='utf-8',
+                      newline='') as stream:
+                imported, skipped = transfer.import_posts(
+                    transfer.read_rows(stream, fmt), options['batch_size'],
+                    options['create_missing'], on_error, on_batch, scope)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: {imported}, пропущено: {skipped}, '
+            f'{elapsed:.1f} с, {imported / max(elapsed, 1e-9):.0f} строк/с'))
+        if not options['skip_derived'] and imported:
+            timings = transfer.rebuild_derived(
+                None if options['full_rebuild'] else scope)
+            self.stdout.write(', '.join(
+                f'{name}: {seconds:.1f} с'
+                for name, seconds in timings.items()))
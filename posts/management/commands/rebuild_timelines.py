@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.models import TimelineEntry
+from posts.timeline import get_timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*',
+                            help='только для этих пользователей')
+        parser.add_argument('--trim', action='store_true',
+                            help='только обрезать ленты до MAX_ENTRIES')
+
+    def handle(self, *args, **options):
+        timeline = get_timeline()
+        users = None
+        if options['usernames']:
+            users = list(User.objects.filter(
+                username__in=options['usernames']))
+        if options['trim']:
+            user_ids = (TimelineEntry.objects.values_list('user', flat=True)
+                        .distinct())
+            if users is not None:
+                user_ids = [user.pk for user in users]
+            for user_id in user_ids:
+                timeline.trim(user_id)
+            self.stdout.write(self.style.SUCCESS('Ленты обрезаны'))
+            return
+        created = timeline.rebuild(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {created}'))
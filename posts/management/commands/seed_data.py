@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import seeding, transfer
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу синтетическими пользователями, постами, '
+            'подписками и комментариями с реалистичным перекосом')
+
+    def add_arguments(self, parser):
+        defaults = seeding.DEFAULTS
+        for name in ('users', 'groups', 'posts', 'follows', 'comments',
+                     'image_pool', 'days', 'batch_size', 'seed'):
+            parser.add_argument('--' + name.replace('_', '-'), type=int,
+                                default=defaults[name])
+        for name in ('images', 'zipf', 'pareto'):
+            parser.add_argument('--' + name, type=float,
+                                default=defaults[name])
+        parser.add_argument('--prefix', default=defaults['prefix'],
+                            help='префикс имён пользователей и групп')
+        parser.add_argument('--password', default=defaults['password'])
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='не пересобирать счётчики, поиск и ленты')
+
+    def handle(self, *args, **options):
+        def progress(name, done, rate):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{name}: {done}, {rate:.0f} строк/с')
+
+        start = time.perf_counter()
+        seeder = seeding.Seeder(progress, **{
+            name: options[name] for name in seeding.DEFAULTS})
+        counts = seeder.run()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(', '.join(
+            f'{name}: {count}' for name, count in counts.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Сгенерировано за {elapsed:.1f} с, '
+            f'{sum(counts.values()) / max(elapsed, 1e-9):.0f} строк/с'))
+        if not options['skip_derived']:
+            timings = transfer.rebuild_derived()
+            self.stdout.write(', '.join(
+                f'{name}: {seconds:.1f} с'
+                for name, seconds in timings.items()))
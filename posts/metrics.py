@@ -0,0 +1,53 @@
+import threading
+
+
+class Metrics:
+    """Простейший реестр метрик процесса: счётчики и сводки.
+
+    Сводка хранит count, sum и max наблюдений — этого достаточно для
+    средних значений и экспорта в формате Prometheus. Gauge — функция,
+    которая вызывается при сборе метрик.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.summaries = {}
+        self.gauges = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            count, total, peak = self.summaries.get(key, (0, 0, value))
+            self.summaries[key] = (count + 1, total + value,
+                                   max(peak, value))
+
+    def gauge(self, name, func, **labels):
+        with self._lock:
+            self.gauges[self._key(name, labels)] = func
+
+    def collect_gauges(self):
+        with self._lock:
+            gauges = dict(self.gauges)
+        return {key: func() for key, func in gauges.items()}
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters), dict(self.summaries)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.summaries.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:19
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    db = schema_editor.connection.alias
+    follows = Follow.objects.using(db)
+    keep = (follows.values('user', 'author')
+            .annotate(keep=Min('id')).values('keep'))
+    duplicates = follows.exclude(id__in=keep)
+    affected = set()
+    for pair in duplicates.values_list('user', 'author'):
+        affected.update(pair)
+    if not affected:
+        return
+    duplicates.delete()
+
+    def count(field):
+        counts = (Follow.objects.filter(**{field: OuterRef('pk')})
+                  .order_by().values(field).annotate(n=Count('pk'))
+                  .values('n'))
+        return Coalesce(Subquery(counts), 0)
+
+    # 0012 посчитала подписки вместе с дублями.
+    UserStats.objects.using(db).filter(user__in=affected).update(
+        followers_count=count('author'), following_count=count('user'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_follows,
+                             migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db import migrations
+
+TABLE = 'posts_search'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        "text, group_title, author, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f'INSERT INTO {TABLE} (rowid, text, group_title, author) '
+        "SELECT p.id, p.text, COALESCE(g.title, ''), u.username "
+        'FROM posts_post p '
+        f'JOIN {User._meta.db_table} u ON u.id = p.author_id '
+        'LEFT JOIN posts_group g ON g.id = p.group_id'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_post_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
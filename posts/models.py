@@ -1,9 +1,16 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Автор и группа одним запросом вместе с постами."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField('текст')
     pub_date = models.DateTimeField('дата публикации', auto_now_add=True)
@@ -15,18 +22,42 @@ class Post(models.Model):
                               related_name='posts',
                               verbose_name='группа')
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    comment_count = models.PositiveIntegerField('комментариев', default=0,
+                                                editable=False)
+    # Имена заранее построенных версий картинки в хранилище.
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text
 
+    @property
+    def card_url(self):
+        """Картинка для карточки в ленте, без Pillow и KV-хранилища."""
+        name = self.renditions.get('card')
+        if name:
+            return default_storage.url(name)
+        return self.image.url if self.image else ''
+
 
 class Group(models.Model):
     title = models.CharField('заголовок', max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField('описание')
+    posts_count = models.PositiveIntegerField('постов', default=0,
+                                              editable=False)
 
     def __str__(self):
         return self.title
@@ -40,6 +71,12 @@ class Comment(models.Model):
     text = models.TextField('текст')
     created = models.DateTimeField('дата публикации', auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -49,3 +86,48 @@ class Follow(models.Model):
                              related_name='follower')
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='following')
+
+    class Meta:
+        constraints = [
+            # Индекс (user, author) заодно обслуживает выборки подписок.
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+        indexes = [
+            # Список подписчиков автора в порядке id без сортировки.
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаемые posts.counters."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    posts_count = models.PositiveIntegerField('постов', default=0)
+    followers_count = models.PositiveIntegerField('подписчиков', default=0,
+                                                  db_index=True)
+    following_count = models.PositiveIntegerField('подписок', default=0)
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    pub_date = models.DateTimeField('дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='timeline_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
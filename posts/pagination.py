@@ -0,0 +1,289 @@
+import base64
+import binascii
+import datetime as dt
+import hashlib
+import json
+import math
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .caching import get_or_set
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, direction='next', number=1):
+    payload = {
+        'v': [v.isoformat() if isinstance(v, dt.datetime) else v
+              for v in values],
+        'd': direction,
+        'n': number,
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = payload['v']
+        direction = payload.get('d', 'next')
+        number = int(payload.get('n', 1))
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(token)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(token)
+    return values, direction, max(number, 1)
+
+
+class CursorPage:
+    """Страница ленты, построенная по ключу (pub_date, id) без OFFSET.
+
+    Запрос выполняется при первом обращении к записям, поэтому страница,
+    отданная из кеша фрагментов, не обращается к базе.
+    """
+
+    def __init__(self, queryset, number, paginator, reverse=False,
+                 has_next=None, has_previous=None, fallback=False):
+        self.queryset = queryset
+        self._number = number
+        self.paginator = paginator
+        self._reverse = reverse
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self._fallback = fallback
+        self._rows = None
+
+    def __repr__(self):
+        return '<CursorPage %s>' % self._number
+
+    def _fetch(self):
+        if self._rows is None:
+            per_page = self.paginator.per_page
+            rows = list(self.queryset[:per_page + 1])
+            fallback, self._fallback = self._fallback, False
+            if not rows and fallback:
+                # Курсор за концом ленты (хвост удалён, устаревшая
+                # ссылка) — вместо пустой страницы первая.
+                self.queryset = self.paginator.first_queryset()
+                self._number, self._reverse = 1, False
+                self._has_next, self._has_previous = None, False
+                return self._fetch()
+            more = len(rows) > per_page
+            rows = rows[:per_page]
+            if self._reverse:
+                rows.reverse()
+                if self._has_previous is None:
+                    self._has_previous = more and self._number > 1
+            elif self._has_next is None:
+                self._has_next = more
+            self._rows = rows
+        return self._rows
+
+    @property
+    def number(self):
+        if self._fallback:
+            # Номер известен только после запроса: страница может
+            # оказаться первой.
+            self._fetch()
+        return self._number
+
+    @property
+    def object_list(self):
+        return self._fetch()
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        self._fetch()
+        return self._has_next
+
+    def has_previous(self):
+        self._fetch()
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    @property
+    def next_cursor(self):
+        if not self.has_next() or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1], 'next',
+                                         self.number + 1)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous() or not self.object_list:
+            return None
+        if self.number == 2:
+            # Вторая страница ведёт на первую, для неё курсор не нужен.
+            return ''
+        return self.paginator.cursor_for(self.object_list[0], 'prev',
+                                         self.number - 1)
+
+
+class CursorPaginator:
+    """Keyset-пагинация: сравнение по ключу вместо COUNT(*) и OFFSET.
+
+    ``keys`` — поля сортировки (по убыванию, либо по возрастанию при
+    ``ascending=True``), последнее поле должно быть уникальным. Общее
+    число записей считается только по запросу (``approximate_total``)
+    и кешируется на ``count_timeout`` секунд.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'pk'),
+                 approximate_total=False, count_timeout=300,
+                 ascending=False):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = keys
+        self.ascending = ascending
+        self.approximate_total = approximate_total
+        self.count_timeout = count_timeout
+
+    def _field(self, name):
+        meta = self.object_list.model._meta
+        return meta.pk if name == 'pk' else meta.get_field(name)
+
+    def _value(self, obj, name):
+        if isinstance(obj, dict):
+            # Строки из values(): ключи должны быть среди полей выборки.
+            return obj[name]
+        if name == 'pk':
+            return obj.pk
+        return getattr(obj, self._field(name).attname)
+
+    def cursor_for(self, obj, direction, number):
+        values = [self._value(obj, key) for key in self.keys]
+        return encode_cursor(values, direction, number)
+
+    def _parse_values(self, values):
+        if len(values) != len(self.keys):
+            raise InvalidCursor(values)
+        parsed = []
+        for key, value in zip(self.keys, values):
+            field = self._field(key)
+            if field.get_internal_type() == 'DateTimeField':
+                if not isinstance(value, str):
+                    raise InvalidCursor(values)
+                try:
+                    value = parse_datetime(value)
+                except (ValueError, TypeError):
+                    # Правильный формат, но невозможная дата: 2024-13-01.
+                    raise InvalidCursor(values)
+            else:
+                try:
+                    value = field.to_python(value)
+                except Exception:
+                    value = None
+            if value is None:
+                raise InvalidCursor(values)
+            parsed.append(value)
+        return parsed
+
+    def _after(self, values, lookup):
+        # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+        condition = Q()
+        for i, key in enumerate(self.keys):
+            term = Q(**{'%s__%s' % (key, lookup): values[i]})
+            for prev_key, prev_value in zip(self.keys[:i], values[:i]):
+                term &= Q(**{prev_key: prev_value})
+            condition |= term
+        return condition
+
+    def _ordering(self, forward=True):
+        prefix = '' if forward == self.ascending else '-'
+        return [prefix + key for key in self.keys]
+
+    def _lookup(self, forward=True):
+        return 'gt' if forward == self.ascending else 'lt'
+
+    def first_queryset(self):
+        return self.object_list.order_by(*self._ordering())
+
+    def page(self, cursor=None):
+        if not cursor:
+            return CursorPage(self.first_queryset(), 1, self,
+                              has_previous=False)
+        values, direction, number = decode_cursor(cursor)
+        values = self._parse_values(values)
+        if direction == 'next':
+            queryset = (self.object_list
+                        .filter(self._after(values, self._lookup()))
+                        .order_by(*self._ordering()))
+            return CursorPage(queryset, number, self, has_previous=True,
+                              fallback=True)
+        queryset = (self.object_list
+                    .filter(self._after(values, self._lookup(False)))
+                    .order_by(*self._ordering(False)))
+        return CursorPage(queryset, number, self, reverse=True,
+                          has_next=True, fallback=True)
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    @property
+    def count(self):
+        if not self.approximate_total:
+            return None
+        key = 'cursor_count:' + hashlib.md5(
+            str(self.object_list.query).encode()).hexdigest()
+        return get_or_set(key, self.object_list.count, self.count_timeout)
+
+    @property
+    def num_pages(self):
+        count = self.count
+        if count is None:
+            return None
+        return max(math.ceil(count / self.per_page), 1)
+
+
+def paginate(request, queryset, per_page, count=None):
+    """Возвращает пару (page, paginator) для ленты постов.
+
+    Курсорный режим включается настройкой ``FEED_PAGINATION = 'cursor'``
+    или наличием ``?cursor=`` в запросе, иначе используется Paginator.
+    ``count`` — уже известное число постов (денормализованный счётчик),
+    чтобы Paginator не делал отдельный COUNT(*).
+    """
+    cursor = request.GET.get('cursor')
+    mode = getattr(settings, 'FEED_PAGINATION', 'offset')
+    if cursor is not None or mode == 'cursor':
+        paginator = CursorPaginator(
+            queryset, per_page,
+            approximate_total=getattr(settings, 'FEED_APPROXIMATE_TOTAL',
+                                      False))
+        return paginator.get_page(cursor), paginator
+    paginator = Paginator(queryset, per_page)
+    if count is not None:
+        paginator.count = count
+    page = paginator.get_page(request.GET.get('page'))
+    # Окно номеров вокруг текущей страницы вместо полного page_range.
+    page.page_window = paginator.get_elided_page_range(
+        page.number, on_each_side=2, on_ends=1)
+    return page, paginator
@@ -0,0 +1,184 @@
+"""Журнал медленных и повторяющихся SQL-запросов в рамках одного запроса.
+
+Каждый запрос к БД сводится к отпечатку: литералы и списки IN заменены
+на «?». Одинаковый SQL с одинаковыми параметрами — дубль, один отпечаток
+с разными параметрами много раз подряд — признак N+1. Для медленных и
+подозрительных запросов в лог пишется место вызова в коде проекта.
+
+Представления объявляют бюджет запросов декоратором ``query_budget``;
+при QUERY_LOG['RAISE'] (тесты) превышение бюджета — исключение.
+"""
+import contextlib
+import logging
+import re
+import time
+import traceback
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .dbhooks import wrapping
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    # Запросы дольше этого, мс, пишутся в лог всегда.
+    'SLOW_MS': 100,
+    # Сколько раз один отпечаток может встретиться до предупреждения N+1.
+    'REPEAT_THRESHOLD': 5,
+    # Превышение бюджета — исключение вместо записи в лог.
+    'RAISE': False,
+}
+
+PROJECT_DIR = str(Path(__file__).resolve().parent.parent)
+# Обёртки execute_wrapper — не место вызова.
+WRAPPER_FILES = {str(Path(__file__).resolve().with_name(name)) for name in
+                 ('querylog.py', 'instrumentation.py', 'dbhooks.py')}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:\?|%s)\s*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'QUERY_LOG', {})}
+
+
+def fingerprint(sql):
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def call_site():
+    """Ближайший кадр стека из кода проекта, а не Django."""
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if (frame.filename.startswith(PROJECT_DIR)
+                and frame.filename not in WRAPPER_FILES
+                and 'site-packages' not in frame.filename):
+            return f'{frame.filename[len(PROJECT_DIR) + 1:]}:{frame.lineno}'
+    return '?'
+
+
+def query_budget(limit):
+    """Объявляет максимум SQL-запросов для представления."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class QueryLog:
+    def __init__(self, config):
+        self.slow = config['SLOW_MS'] / 1000
+        self.threshold = config['REPEAT_THRESHOLD']
+        self.count = 0
+        self.shapes = Counter()
+        self.exact = Counter()
+        self.sites = {}
+        self.slow_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, params, time.perf_counter() - start)
+
+    def record(self, sql, params, duration):
+        self.count += 1
+        shape = fingerprint(sql)
+        self.shapes[shape] += 1
+        self.exact[sql, repr(params)] += 1
+        # Стек дорогой: снимаем только там, где он пойдёт в отчёт.
+        if self.shapes[shape] == 2 and shape not in self.sites:
+            self.sites[shape] = call_site()
+        if duration >= self.slow:
+            self.slow_queries.append((duration, sql, call_site()))
+
+    def duplicates(self):
+        """[(число, sql)] одинаковых запросов с одинаковыми параметрами."""
+        return [(count, sql) for (sql, _), count in self.exact.items()
+                if count > 1]
+
+    def repeated(self):
+        """[(число, отпечаток, место)] для похожих на N+1 запросов."""
+        return [(count, shape, self.sites.get(shape, '?'))
+                for shape, count in self.shapes.most_common()
+                if count >= self.threshold]
+
+    def problems(self, label):
+        lines = []
+        for duration, sql, site in self.slow_queries:
+            lines.append(f'{label}: медленный запрос {duration * 1000:.1f} '
+                         f'мс в {site}: {sql}')
+        for count, sql in self.duplicates():
+            site = self.sites.get(fingerprint(sql), '?')
+            lines.append(f'{label}: дубль x{count} в {site}: {sql}')
+        for count, shape, site in self.repeated():
+            lines.append(f'{label}: N+1? x{count} в {site}: {shape}')
+        return lines
+
+
+@contextlib.contextmanager
+def capture(config=None):
+    """Собирает QueryLog по всем алиасам БД внутри блока."""
+    log = QueryLog(config or get_config())
+    with wrapping(log):
+        yield log
+
+
+class QueryLogMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        config = get_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+        with capture(config) as log:
+            response = self.get_response(request)
+        return self.report(request, response, log, config)
+
+    async def __acall__(self, request):
+        config = get_config()
+        if not config['ENABLED']:
+            return await self.get_response(request)
+        with capture(config) as log:
+            response = await self.get_response(request)
+        return self.report(request, response, log, config)
+
+    def report(self, request, response, log, config):
+        match = request.resolver_match
+        label = match.view_name if match else request.path
+        for line in log.problems(label):
+            logger.warning(line)
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and log.count > budget:
+            message = (f'{label}: {log.count} SQL-запросов при бюджете '
+                       f'{budget}')
+            if config['RAISE']:
+                raise QueryBudgetExceeded(
+                    '\n'.join([message] + log.problems(label)))
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
@@ -0,0 +1,154 @@
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from .feed_cache import bump_version
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # 0 — генерировать синхронно в потоке запроса (тесты, отладка).
+    'WORKERS': 2,
+    # Пропорции карточки в ленте и ширины для srcset.
+    'RATIO': (960, 339),
+    'CARD_WIDTH': 960,
+    'WIDTHS': (480, 960, 1440),
+    # Порядок важен: браузер берёт первый поддерживаемый <source>.
+    'FORMATS': ('AVIF', 'WEBP', 'JPEG'),
+    'QUALITY': {'AVIF': 60, 'WEBP': 80, 'JPEG': 85},
+}
+
+EXTENSIONS = {'AVIF': 'avif', 'WEBP': 'webp', 'JPEG': 'jpg'}
+MIME_TYPES = {'AVIF': 'image/avif', 'WEBP': 'image/webp',
+              'JPEG': 'image/jpeg'}
+
+_executor = None
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'IMAGE_RENDITIONS', {})}
+
+
+def get_executor(workers):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=workers,
+                                       thread_name_prefix='renditions')
+    return _executor
+
+
+def rendition_key(fmt, width):
+    return f'{EXTENSIONS[fmt]}-{width}'
+
+
+def supported_formats(config):
+    return list(_supported_formats(tuple(config['FORMATS'])))
+
+
+@functools.lru_cache(maxsize=None)
+def _supported_formats(formats):
+    # features.check трогает Pillow: один раз на набор форматов, а не на
+    # каждую карточку ленты.
+    formats = [fmt for fmt in formats
+               if fmt == 'JPEG' or features.check(fmt.lower())]
+    # JPEG нужен всегда: это src карточки и запасной вариант.
+    if 'JPEG' not in formats:
+        formats.append('JPEG')
+    return tuple(formats)
+
+
+def iter_specs(config, source_width=None):
+    """Пары (ключ, spec) для всех версий; шире оригинала не растягиваем."""
+    ratio_w, ratio_h = config['RATIO']
+    widths = sorted(set(config['WIDTHS']) | {config['CARD_WIDTH']})
+    for fmt in supported_formats(config):
+        for width in widths:
+            if (source_width and width > source_width
+                    and width != config['CARD_WIDTH']):
+                continue
+            yield rendition_key(fmt, width), {
+                'size': (width, round(width * ratio_h / ratio_w)),
+                'format': fmt,
+                'quality': config['QUALITY'].get(fmt, 85),
+            }
+
+
+def rendition_name(post, key):
+    return f'posts/renditions/{post.pk}/{key}.{key.split("-")[0]}'
+
+
+def render(image, spec):
+    result = ImageOps.fit(image, spec['size'], Image.LANCZOS)
+    if spec['format'] == 'JPEG' and result.mode not in ('RGB', 'L'):
+        result = result.convert('RGB')
+    buffer = BytesIO()
+    result.save(buffer, spec['format'], quality=spec['quality'])
+    return buffer.getvalue()
+
+
+def generate(post_id, config=None):
+    """Строит все версии картинки поста и сохраняет их имена в Post."""
+    config = config or get_config()
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return {}
+    renditions = {}
+    with post.image.open('rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    for key, spec in iter_specs(config, image.width):
+        path = rendition_name(post, key)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        renditions[key] = default_storage.save(
+            path, ContentFile(render(image, spec)))
+    renditions['card'] = renditions[rendition_key('JPEG',
+                                                  config['CARD_WIDTH'])]
+    # update() не вызывает сигналы: версию лент меняем сами.
+    Post.objects.filter(pk=post_id, image=post.image.name).update(
+        renditions=renditions)
+    bump_version()
+    return renditions
+
+
+def srcset(post, fmt, config=None):
+    """[(url, width), ...] для формата, по возрастанию ширины."""
+    config = config or get_config()
+    result = []
+    widths = sorted(set(config['WIDTHS']) | {config['CARD_WIDTH']})
+    for width in widths:
+        name = post.renditions.get(rendition_key(fmt, width))
+        if name:
+            result.append((default_storage.url(name), width))
+    return result
+
+
+def _run(post_id):
+    try:
+        return generate(post_id)
+    except Exception:
+        logger.exception('Не удалось построить версии картинки поста %s',
+                         post_id)
+    finally:
+        if get_config()['WORKERS']:
+            connection.close()
+
+
+def schedule(post):
+    """Ставит генерацию в пул после коммита транзакции с постом."""
+    Post.objects.filter(pk=post.pk).update(renditions={})
+    post.renditions = {}
+    workers = get_config()['WORKERS']
+    if workers:
+        transaction.on_commit(
+            lambda: get_executor(workers).submit(_run, post.pk))
+    else:
+        transaction.on_commit(lambda: _run(post.pk))
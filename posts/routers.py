@@ -0,0 +1,127 @@
+"""Чтение лент с реплик, запись и всё остальное — в основную БД.
+
+Представления, помеченные ``replica_reads``, читают с реплики из
+DATABASE_REPLICAS['ALIASES'] (одна реплика на запрос). Если запрос
+что-то записал, в ответ ставится cookie, и следующие STICKY_SECONDS
+запросы этого клиента читают с основной БД: автор сразу видит свой
+пост или комментарий, даже если реплика отстаёт. Сама репликация —
+вне Django (для SQLite — копия файла, litestream и т. п.).
+"""
+import contextvars
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+DEFAULTS = {
+    'ALIASES': [],
+    # Сколько секунд после своей записи клиент читает с основной БД.
+    'STICKY_SECONDS': 5,
+    'COOKIE': 'primary_until',
+}
+
+_current = contextvars.ContextVar('replica_routing', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'DATABASE_REPLICAS', {})}
+
+
+def replica_reads(view):
+    """Разрешает представлению читать с реплики."""
+    view.replica_reads = True
+    return view
+
+
+def note_write():
+    """Запись мимо ORM (очередь ingest) — как запись в основную БД."""
+    state = _current.get()
+    if state is not None:
+        state.wrote = True
+
+
+class RoutingState:
+    def __init__(self, sticky):
+        self.sticky = sticky
+        self.replica = None
+        self.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        # Связанные объекты читаются из той же БД, что и их владелец.
+        if (state is None or state.replica is None or state.wrote
+                or hints.get('instance') is not None):
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной БД: связи между ними допустимы.
+        databases = {DEFAULT_DB_ALIAS, *get_config()['ALIASES']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        config = get_config()
+        state = self.start(request, config)
+        token = _current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(response, state, config)
+
+    async def __acall__(self, request):
+        config = get_config()
+        state = self.start(request, config)
+        token = _current.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(response, state, config)
+
+    def start(self, request, config):
+        try:
+            until = float(request.COOKIES.get(config['COOKIE'], 0))
+        except ValueError:
+            until = 0
+        return RoutingState(sticky=until > time.time())
+
+    def finish(self, response, state, config):
+        if state.wrote and config['STICKY_SECONDS']:
+            response.set_cookie(
+                config['COOKIE'], str(time.time() + config['STICKY_SECONDS']),
+                max_age=config['STICKY_SECONDS'], httponly=True,
+                samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _current.get()
+        aliases = get_config()['ALIASES']
+        if (state is not None and aliases and not state.sticky
+                and getattr(view_func, 'replica_reads', False)):
+            state.replica = random.choice(aliases)
@@ -0,0 +1,224 @@
+import math
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Post
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+
+# Виртуальная таблица FTS5 создаётся миграцией 0015_search_index.
+TABLE = 'posts_search'
+
+
+def terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def valid_after(values):
+    """Позиция из курсора — ровно [rank, id] из чисел."""
+    if len(values) != 2 or any(isinstance(v, bool) for v in values):
+        return False
+    rank, pk = values
+    return (isinstance(rank, (int, float)) and math.isfinite(rank)
+            and isinstance(pk, int))
+
+
+class SearchPage:
+    """Страница результатов: посты по убыванию релевантности.
+
+    Совместима с paginator.html в курсорном режиме; назад ведёт только
+    ссылка на первую страницу.
+    """
+
+    is_cursor = True
+    num_pages = None
+
+    def __init__(self, posts, number, next_cursor):
+        self.paginator = self
+        self.object_list = posts
+        self.number = number
+        self.next_cursor = next_cursor
+        self.previous_cursor = '' if number > 1 else None
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class SearchBackend:
+    def index(self, post):
+        raise NotImplementedError
+
+    def remove(self, post_id):
+        raise NotImplementedError
+
+    def reindex(self, batch_size=1000, posts=None):
+        """Пересобирает индекс: весь или только для queryset ``posts``."""
+        raise NotImplementedError
+
+    def ranked(self, query, after, limit):
+        """[(post_id, rank), ...] по возрастанию (rank, id).
+
+        ``after`` — пара (rank, id) последней записи предыдущей страницы.
+        """
+        raise NotImplementedError
+
+    def search(self, query, cursor=None, per_page=10):
+        after, number = None, 1
+        if cursor:
+            try:
+                after, _, number = decode_cursor(cursor)
+            except InvalidCursor:
+                after = None
+            if after is not None and not valid_after(after):
+                # Подделанный курсор — первая страница, а не 500.
+                after, number = None, 1
+        rows = []
+        if terms(query):
+            rows = self.ranked(query, after, per_page + 1)
+        next_cursor = None
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            last_pk, last_rank = rows[-1]
+            next_cursor = encode_cursor([last_rank, last_pk], 'next',
+                                        number + 1)
+        posts = Post.objects.for_feed().in_bulk([pk for pk, _ in rows])
+        return SearchPage([posts[pk] for pk, _ in rows if pk in posts],
+                          number, next_cursor)
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Инвертированный индекс FTS5, rowid записи совпадает с id поста."""
+
+    def _row(self, post):
+        return (post.pk, post.text,
+                post.group.title if post.group_id else '',
+                post.author.username)
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                           [post.pk])
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, text, group_title, author) '
+                'VALUES (%s, %s, %s, %s)', self._row(post))
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                           [post_id])
+
+    def reindex(self, batch_size=1000, posts=None):
+        queryset = Post.objects if posts is None else posts
+        rows = queryset.order_by().values_list(
+            'pk', 'text', 'group__title', 'author__username')
+        total = 0
+        with connection.cursor() as cursor:
+            if posts is None:
+                cursor.execute(f'DELETE FROM {TABLE}')
+            else:
+                cursor.executemany(
+                    f'DELETE FROM {TABLE} WHERE rowid = %s',
+                    [(pk,) for pk in queryset.values_list('pk', flat=True)])
+            batch = []
+            for pk, text, group_title, author in rows.iterator(
+                    chunk_size=batch_size):
+                batch.append((pk, text, group_title or '', author))
+                if len(batch) >= batch_size:
+                    total += self._insert(cursor, batch)
+                    batch = []
+            if batch:
+                total += self._insert(cursor, batch)
+            if posts is None:
+                cursor.execute(
+                    f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+        return total
+
+    def _insert(self, cursor, batch):
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, text, group_title, author) '
+            'VALUES (%s, %s, %s, %s)', batch)
+        return len(batch)
+
+    def ranked(self, query, after, limit):
+        # Каждое слово — отдельная фраза с префиксным поиском:
+        # пользовательский ввод не попадает в синтаксис MATCH.
+        match = ' '.join('"%s"*' % term for term in terms(query))
+        sql = (f'SELECT rowid, bm25({TABLE}) AS rank FROM {TABLE} '
+               f'WHERE {TABLE} MATCH %s')
+        params = [match]
+        if after:
+            sql = (f'SELECT rowid, rank FROM ({sql}) '
+                   'WHERE rank > %s OR (rank = %s AND rowid > %s)')
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY rank, rowid LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(int(pk), rank) for pk, rank in cursor.fetchall()]
+
+
+class PostgresBackend(SearchBackend):
+    """tsvector по тексту, группе и автору; индекс не хранится отдельно.
+
+    Для больших таблиц стоит добавить GIN-индекс по тому же выражению.
+    """
+
+    config = 'russian'
+
+    def _vector(self):
+        from django.contrib.postgres.search import SearchVector
+        return (SearchVector('text', weight='A', config=self.config)
+                + SearchVector('group__title', weight='B',
+                               config=self.config)
+                + SearchVector('author__username', weight='B',
+                               config=self.config))
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def reindex(self, batch_size=1000, posts=None):
+        return (Post.objects if posts is None else posts).count()
+
+    def ranked(self, query, after, limit):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        from django.db.models import F, Q
+        search_query = SearchQuery(
+            ' & '.join('%s:*' % term for term in terms(query)),
+            search_type='raw', config=self.config)
+        # Ранг инвертирован, чтобы порядок совпадал с bm25 (меньше — выше).
+        queryset = (Post.objects
+                    .annotate(document=self._vector())
+                    .filter(document=search_query)
+                    .annotate(rank=-SearchRank(F('document'),
+                                               search_query)))
+        if after:
+            queryset = queryset.filter(
+                Q(rank__gt=after[0]) | Q(rank=after[0], pk__gt=after[1]))
+        return list(queryset.order_by('rank', 'pk')
+                    .values_list('pk', 'rank')[:limit])
+
+
+def get_search_backend():
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if path is None:
+        path = ('posts.search.PostgresBackend'
+                if connection.vendor == 'postgresql'
+                else 'posts.search.SQLiteFTSBackend')
+    return import_string(path)()
@@ -0,0 +1,213 @@
+"""Синтетические данные с перекосами, как у живого сообщества.
+
+Авторство постов и популярность авторов распределены по Ципфу: немного
+пользователей пишут большую часть постов и собирают большую часть
+подписчиков. Число подписок на пользователя — степенное (Парето), так
+что в графе есть и «молчуны», и подписчики на сотни авторов. Всё
+строится через bulk_create пачками и воспроизводимо при одном seed.
+"""
+import bisect
+import itertools
+import random
+import time
+from array import array
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from .models import Comment, Follow, Group, Post
+from .transfer import batches, explicit_dates
+
+User = get_user_model()
+
+DEFAULTS = {
+    'users': 1000,
+    'groups': 20,
+    'posts': 100000,
+    # Среднее число подписок на пользователя.
+    'follows': 20,
+    'comments': 100000,
+    # Доля постов с картинкой; сами картинки — небольшой общий набор.
+    'images': 0.2,
+    'image_pool': 16,
+    # Показатель Ципфа: чем больше, тем сильнее перекос.
+    'zipf': 1.1,
+    # Показатель Парето для числа подписок.
+    'pareto': 1.5,
+    'days': 365,
+    'prefix': 'seed',
+    'password': 'seed-password',
+    'batch_size': 5000,
+    'seed': 0,
+}
+
+
+class ZipfSampler:
+    """Выбор элемента с весом 1 / rank ** s за O(log n).
+
+    По умолчанию ранги раздаются в случайном порядке, поэтому
+    «популярными» оказываются не первые по id объекты.
+    """
+
+    def __init__(self, items, s, rnd, shuffle=True):
+        if shuffle:
+            items = list(items)
+            rnd.shuffle(items)
+        self.items = items
+        self.cum_weights = array('d', itertools.accumulate(
+            1.0 / rank ** s for rank in range(1, len(items) + 1)))
+        self.rnd = rnd
+
+    def __call__(self):
+        point = self.rnd.random() * self.cum_weights[-1]
+        return self.items[bisect.bisect_right(self.cum_weights, point)]
+
+
+class Seeder:
+    def __init__(self, progress=None, **options):
+        self.options = {**DEFAULTS, **options}
+        self.rnd = random.Random(self.options['seed'])
+        self.progress = progress
+        self.now = timezone.now()
+
+    def report(self, name, done, start):
+        if self.progress is not None:
+            elapsed = max(time.perf_counter() - start, 1e-9)
+            self.progress(name, done, done / elapsed)
+
+    def created_ids(self, model, after):
+        """id строк, вставленных после ``after``: списки id на десятки
+        миллионов строк не передаются в IN (...)."""
+        return array('q', model.objects.filter(pk__gt=after).order_by('pk')
+                     .values_list('pk', flat=True).iterator(chunk_size=10000))
+
+    def last_pk(self, model):
+        return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def bulk(self, model, objects, **kwargs):
+        """bulk_create генератора пачками, без списка на всю таблицу."""
+        start = time.perf_counter()
+        done = 0
+        for batch in batches(objects, self.options['batch_size']):
+            model.objects.bulk_create(batch, **kwargs)
+            done += len(batch)
+            self.report(model._meta.model_name, done, start)
+        return done
+
+    def run(self):
+        counts = {}
+        user_ids = self.users(counts)
+        group_ids = self.groups(counts)
+        popularity = ZipfSampler(user_ids, self.options['zipf'], self.rnd)
+        images = self.images()
+        after = self.last_pk(Post)
+        counts['posts'] = self.posts(popularity, group_ids, images)
+        counts['follows'] = self.follows(user_ids, popularity)
+        counts['comments'] = self.comments(after, popularity)
+        return counts
+
+    def users(self, counts):
+        prefix = self.options['prefix']
+        # Хеш считается один раз: PBKDF2 на каждого пользователя — минуты.
+        password = make_password(self.options['password'])
+        after = self.last_pk(User)
+        counts['users'] = self.bulk(User, (
+            User(username=f'{prefix}{i}', password=password)
+            for i in range(self.options['users'])))
+        return self.created_ids(User, after)
+
+    def groups(self, counts):
+        prefix = self.options['prefix']
+        after = self.last_pk(Group)
+        counts['groups'] = self.bulk(Group, (
+            Group(title=f'Группа {i}', slug=f'{prefix}-group-{i}',
+                  description=f'Сгенерированная группа {i}')
+            for i in range(self.options['groups'])))
+        return list(self.created_ids(Group, after))
+
+    def images(self):
+        names = []
+        for i in range(self.options['image_pool'] if
+                       self.options['images'] else 0):
+            color = tuple(self.rnd.randrange(256) for _ in range(3))
+            buffer = BytesIO()
+            Image.new('RGB', (1200, 800), color).save(buffer, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/seed/{self.options["prefix"]}-{i}.jpg',
+                ContentFile(buffer.getvalue())))
+        return names
+
+    def posts(self, popularity, group_ids, images):
+        rnd = self.rnd
+        total = self.options['posts']
+        span = self.options['days'] * 86400
+        # Примерно треть постов без группы.
+        groups = group_ids + [None] * (len(group_ids) // 2 or 1)
+
+        def generate():
+            for i in range(total):
+                yield Post(
+                    text=f'Сгенерированный пост {i}',
+                    author_id=popularity(),
+                    group_id=rnd.choice(groups),
+                    image=(rnd.choice(images) if images and
+                           rnd.random() < self.options['images'] else None),
+                    # Ближе к концу — новее: ленты выглядят как живые.
+                    pub_date=self.now - timezone.timedelta(
+                        seconds=span * (total - i) / total
+                        + rnd.random()))
+
+        with explicit_dates(Post, 'pub_date'):
+            return self.bulk(Post, generate())
+
+    def follows(self, user_ids, popularity):
+        rnd = self.rnd
+        mean = self.options['follows']
+        alpha = self.options['pareto']
+        # Масштаб Парето, при котором среднее равно mean.
+        scale = mean * (alpha - 1) / alpha if alpha > 1 else mean
+        limit = len(user_ids) - 1
+
+        def generate():
+            for user_id in user_ids:
+                degree = min(int(scale * rnd.paretovariate(alpha)), limit)
+                authors = set()
+                attempts = 0
+                while len(authors) < degree and attempts < degree * 4:
+                    attempts += 1
+                    author_id = popularity()
+                    if author_id != user_id:
+                        authors.add(author_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        return self.bulk(Follow, generate(), ignore_conflicts=True)
+
+    def comments(self, after, popularity):
+        rnd = self.rnd
+        post_ids = self.created_ids(Post, after)
+        if not post_ids:
+            return 0
+        # Обсуждают в основном свежие посты: ранг — место в ленте, а
+        # pub_date сгенерированных постов растёт вместе с id.
+        post_ids.reverse()
+        discussed = ZipfSampler(post_ids, self.options['zipf'], rnd,
+                                shuffle=False)
+        total = self.options['comments']
+
+        def generate():
+            for i in range(total):
+                yield Comment(
+                    post_id=discussed(), author_id=popularity(),
+                    text=f'Сгенерированный комментарий {i}',
+                    created=self.now - timezone.timedelta(
+                        seconds=rnd.random() * 86400))
+
+        with explicit_dates(Comment, 'created'):
+            return self.bulk(Comment, generate())
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import counters, follow_graph
+from .feed_cache import bump_version
+from .models import Comment, Follow, Group, Post
+from .search import get_search_backend
+from .timeline import get_timeline
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.post_created(instance)
+        get_timeline().push(instance)
+    elif not raw:
+        get_timeline().refresh(instance)
+    if not raw:
+        get_search_backend().index(instance)
+    bump_version()
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.post_deleted(instance)
+    get_search_backend().remove(instance.pk)
+    bump_version()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    # Название группы входит в поисковый индекс её постов и в карточки.
+    if created or raw:
+        return
+    backend = get_search_backend()
+    for post in instance.posts.select_related('author', 'group').iterator():
+        backend.index(post)
+    bump_version()
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    # Имя автора в карточках. Вход пишет только last_login — не сбрасывать.
+    if created or raw:
+        return
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    bump_version()
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.comment_created(instance)
+        bump_version()
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.comment_deleted(instance)
+    bump_version()
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.follow_created(instance)
+        get_timeline().backfill(instance.user, instance.author)
+        follow_graph.invalidate(instance.user_id)
+        bump_version('user:%s' % instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.follow_deleted(instance)
+    get_timeline().prune(instance.user_id, instance.author_id)
+    follow_graph.invalidate(instance.user_id)
+    bump_version('user:%s' % instance.user_id)
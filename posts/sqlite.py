@@ -0,0 +1,37 @@
+"""Прагмы SQLite для каждого нового соединения.
+
+WAL позволяет читать во время записи, synchronous=NORMAL в WAL не теряет
+целостность и не делает fsync на каждый коммит, busy_timeout заставляет
+пишущего подождать блокировку вместо немедленного «database is locked»
+(это единственное ожидание: timeout у sqlite3.connect не задаётся).
+Настройка SQLITE_PRAGMAS заменяет набор целиком; пустой словарь —
+SQLite как есть.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULTS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    # Миллисекунды ожидания блокировки записи.
+    'busy_timeout': 20000,
+    # Отрицательное значение — в КиБ: 64 МиБ кэша страниц.
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def get_pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', DEFAULTS)
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Сырое соединение: прагмы не должны попадать в счётчики запросов
+    # execute_wrapper (querylog, instrumentation).
+    for name, value in get_pragmas().items():
+        connection.connection.execute('PRAGMA %s = %s' % (name, value))
@@ -0,0 +1,159 @@
+from urllib.parse import quote
+
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.http import RFC3986_SUBDELIMS
+from django.utils.safestring import mark_safe
+
+from posts import renditions
+from posts.caching import get_or_set
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        try:
+            timeout = int(timeout)
+        except (ValueError, TypeError):
+            raise template.TemplateSyntaxError(
+                '"feed_cache" tag got a non-integer timeout value: %r'
+                % timeout)
+        key = make_template_fragment_key(
+            self.fragment_name, [var.resolve(context) for var in self.vary_on])
+        return get_or_set(key, lambda: self.nodelist.render(context), timeout,
+                          metric='fragment')
+
+
+@register.tag('feed_cache')
+def do_feed_cache(parser, token):
+    """{% feed_cache timeout name [vary_on ...] %} … {% endfeed_cache %}
+
+    Как встроенный {% cache %}, но пересчёт фрагмента выполняет один
+    процесс (posts.caching.get_or_set).
+    """
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            "'%r' tag requires at least 2 arguments." % bits[0])
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        bits[2],
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
+
+
+@register.simple_tag
+def post_picture(post, sizes='(max-width: 576px) 100vw, 960px'):
+    """<picture> с AVIF/WebP srcset и JPEG-картинкой карточки.
+
+    Пока версии не построены, отдаётся обычный <img> с оригиналом.
+    """
+    if not post.image:
+        return ''
+    config = renditions.get_config()
+    sources = []
+    for fmt in renditions.supported_formats(config):
+        candidates = renditions.srcset(post, fmt, config)
+        if not candidates or fmt == 'JPEG':
+            continue
+        sources.append(format_html(
+            '<source type="{}" srcset="{}" sizes="{}">',
+            renditions.MIME_TYPES[fmt],
+            ', '.join(f'{url} {width}w' for url, width in candidates),
+            sizes))
+    jpeg = renditions.srcset(post, 'JPEG', config)
+    img = format_html(
+        '<img class="card-img" src="{}"{} alt="picture" loading="lazy" />',
+        post.card_url,
+        format_html(' srcset="{}" sizes="{}"',
+                    ', '.join(f'{url} {width}w' for url, width in jpeg),
+                    sizes) if jpeg else '')
+    if not sources:
+        return img
+    return format_html('<picture>{}{}</picture>',
+                       mark_safe(''.join(sources)), img)
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, **params):
+    """Текущая строка запроса с заменёнными параметрами пагинации.
+
+    Пустое значение удаляет параметр: {% page_query cursor=c page=None %}.
+    """
+    request = context.get('request')
+    query = request.GET.copy() if request is not None else QueryDict(
+        mutable=True)
+    for name, value in params.items():
+        query.pop(name, None)
+        if value not in (None, ''):
+            query[name] = value
+    return '?' + query.urlencode()
+
+
+# Заглушки для reverse(): URL маршрута строится один раз на страницу,
+# а значения подставляются строковой операцией.
+USERNAME = 'username0placeholder'
+POST_ID = 987654321
+SLUG = 'slug0placeholder'
+
+
+def url_pattern(name, *args):
+    """Шаблон '%(...)s' для reverse(name, args) с заглушками."""
+    url = reverse(name, args=args).replace('%', '%%')
+    return (url.replace(USERNAME, '%(username)s')
+            .replace(str(POST_ID), '%(post_id)s')
+            .replace(SLUG, '%(slug)s'))
+
+
+def quote_arg(value):
+    # Так же, как reverse() экранирует подставленные аргументы.
+    return quote(str(value), safe=RFC3986_SUBDELIMS + '/~:@')
+
+
+@register.inclusion_tag('post_cards.html', takes_context=True)
+def post_cards(context, posts):
+    """Карточки постов одним проходом шаблона.
+
+    Вместо include и четырёх {% url %} на каждый пост маршруты
+    разворачиваются один раз, а в шаблон идут готовые ссылки.
+    """
+    profile = url_pattern('profile', USERNAME)
+    post_view = url_pattern('post', USERNAME, POST_ID)
+    edit = url_pattern('post_edit', USERNAME, POST_ID)
+    group = url_pattern('group_post', SLUG)
+    user = context.get('user')
+    user_id = user.pk if user is not None else None
+    cards = []
+    for post in posts:
+        values = {'username': quote_arg(post.author.username),
+                  'post_id': post.pk}
+        cards.append({
+            'post': post,
+            'picture': post_picture(post),
+            'profile_url': profile % values,
+            'post_url': post_view % values,
+            'edit_url': (edit % values if user_id is not None
+                         and user_id == post.author_id else ''),
+            'group_url': (group % {'slug': quote_arg(post.group.slug)}
+                          if post.group_id else ''),
+        })
+    return {'cards': cards}
+
+
+@register.inclusion_tag('post_cards.html', takes_context=True)
+def post_card(context, post):
+    return post_cards(context, [post])
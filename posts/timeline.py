@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils.module_loading import import_string
+
+from .caching import get_or_set
+from .models import Follow, Post, TimelineEntry, UserStats
+
+DEFAULTS = {
+    'BACKEND': 'posts.timeline.DatabaseTimeline',
+    # Сколько последних постов хранится во входящей ленте пользователя.
+    'MAX_ENTRIES': 1000,
+    # Авторы с большим числом подписчиков не раскладываются по лентам,
+    # их посты подтягиваются при чтении (гибридная схема).
+    'FANOUT_LIMIT': 5000,
+    'BATCH_SIZE': 1000,
+    'CELEBRITY_CACHE_TIMEOUT': 600,
+}
+
+CELEBRITY_CACHE_KEY = 'timeline:celebrities'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FOLLOW_TIMELINE', {})}
+
+
+class PullTimeline:
+    """Лента без материализации: выборка по подпискам при каждом чтении."""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def posts(self, user):
+        return Post.objects.filter(
+            author__in=Follow.objects.filter(user=user).values('author'))
+
+    def push(self, post):
+        pass
+
+    def refresh(self, post):
+        pass
+
+    def backfill(self, user, author):
+        pass
+
+    def prune(self, user, author):
+        pass
+
+    def rebuild(self, users=None):
+        return 0
+
+
+class DatabaseTimeline(PullTimeline):
+    """Fan-out on write в таблицу TimelineEntry с ограничением размера."""
+
+    @property
+    def max_entries(self):
+        return self.options['MAX_ENTRIES']
+
+    def celebrity_ids(self):
+        return get_or_set(
+            CELEBRITY_CACHE_KEY,
+            lambda: set(
+                UserStats.objects
+                .filter(followers_count__gt=self.options['FANOUT_LIMIT'])
+                .values_list('user', flat=True)
+            ),
+            self.options['CELEBRITY_CACHE_TIMEOUT'],
+            metric='celebrities',
+        )
+
+    def is_celebrity(self, author_id):
+        return author_id in self.celebrity_ids()
+
+    def posts(self, user):
+        inbox = TimelineEntry.objects.filter(user=user).values('post')
+        condition = Q(pk__in=inbox)
+        celebrities = self.celebrity_ids()
+        if celebrities:
+            pulled = (Follow.objects
+                      .filter(user=user, author__in=celebrities)
+                      .values('author'))
+            condition |= Q(author__in=pulled)
+        return Post.objects.filter(condition)
+
+    def push(self, post):
+        if self.is_celebrity(post.author_id):
+            return 0
+        followers = (Follow.objects.filter(author_id=post.author_id)
+                     .values_list('user_id', flat=True).iterator())
+        created = 0
+        batch = []
+        for user_id in followers:
+            batch.append(TimelineEntry(user_id=user_id, post=post,
+                                       author_id=post.author_id,
+                                       pub_date=post.pub_date))
+            if len(batch) >= self.options['BATCH_SIZE']:
+                created += self._push_batch(batch)
+                batch = []
+        if batch:
+            created += self._push_batch(batch)
+        return created
+
+    def _push_batch(self, batch):
+        created = self._write(batch)
+        self.trim_overflowing([entry.user_id for entry in batch])
+        return created
+
+    def refresh(self, post):
+        """Правка поста меняет pub_date: ленты сортируются по копии."""
+        TimelineEntry.objects.filter(post=post).exclude(
+            pub_date=post.pub_date).update(pub_date=post.pub_date)
+
+    def backfill(self, user, author):
+        if self.is_celebrity(author.pk):
+            return 0
+        recent = (Post.objects.filter(author=author)
+                  .order_by('-pub_date')
+                  .values_list('pk', 'pub_date')[:self.max_entries])
+        created = self._write([
+            TimelineEntry(user=user, post_id=pk, author=author,
+                          pub_date=pub_date)
+            for pk, pub_date in recent
+        ])
+        self.trim(user)
+        return created
+
+    def prune(self, user, author):
+        TimelineEntry.objects.filter(user=user, author=author).delete()
+
+    def trim(self, user):
+        boundary = (TimelineEntry.objects.filter(user=user)
+                    .order_by('-pub_date')
+                    .values_list('pub_date', flat=True)
+                    [self.max_entries:self.max_entries + 1])
+        boundary = list(boundary)
+        if boundary:
+            TimelineEntry.objects.filter(
+                user=user, pub_date__lte=boundary[0]).delete()
+
+    def trim_overflowing(self, user_ids):
+        """trim для тех из user_ids, чья лента длиннее MAX_ENTRIES.
+
+        Один подсчёт по индексу (user, pub_date) на пачку fan-out вместо
+        trim на каждого подписчика.
+        """
+        overflowing = (TimelineEntry.objects.filter(user__in=user_ids)
+                       .values('user').annotate(entries=Count('pk'))
+                       .filter(entries__gt=self.max_entries)
+                       .values_list('user', flat=True))
+        for user_id in overflowing:
+            self.trim(user_id)
+
+    @transaction.atomic
+    def rebuild(self, users=None):
+        entries = TimelineEntry.objects.all()
+        follows = Follow.objects.select_related('author', 'user')
+        if users is not None:
+            entries = entries.filter(user__in=users)
+            follows = follows.filter(user__in=users)
+        entries.delete()
+        cache.delete(CELEBRITY_CACHE_KEY)
+        created = 0
+        for follow in follows.iterator():
+            created += self.backfill(follow.user, follow.author)
+        return created
+
+    def _write(self, entries):
+        return len(TimelineEntry.objects.bulk_create(
+            entries, batch_size=self.options['BATCH_SIZE'],
+            ignore_conflicts=True))
+
+
+def get_timeline():
+    config = get_config()
+    backend = import_string(config['BACKEND'])
+    return backend(**config)
@@ -0,0 +1,284 @@
+import contextlib
+import csv
+import datetime as dt
+import itertools
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters
+from .feed_cache import bump_version
+from .models import Follow, Group, Post
+from .search import get_search_backend
+from .timeline import get_timeline
+
+User = get_user_model()
+
+FORMATS = ('jsonl', 'csv')
+FIELDS = ('id', 'text', 'pub_date', 'author', 'group', 'group_title',
+          'image')
+# В JSONL поле может оказаться списком или объектом.
+STRING_FIELDS = ('text', 'pub_date', 'author', 'group', 'group_title',
+                 'image')
+
+
+class RowError(ValueError):
+    pass
+
+
+@contextlib.contextmanager
+def explicit_dates(model, *names):
+    """Отключает auto_now_add, чтобы bulk_create сохранил заданные даты."""
+    fields = [model._meta.get_field(name) for name in names]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def read_rows(stream, fmt):
+    """Построчно читает JSONL или CSV, не загружая файл целиком.
+
+    Вместо неразборчивой строки JSONL отдаётся RowError: импорт
+    пропускает её, как любую другую плохую запись.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield RowError(f'неверный JSON: {error}')
+            continue
+        if not isinstance(row, dict):
+            yield RowError('запись не объект JSON')
+            continue
+        yield row
+
+
+def check_row(row):
+    """Та же запись или RowError, если поля не те, что ждёт импорт."""
+    if isinstance(row, RowError):
+        return row
+    for name in STRING_FIELDS:
+        if row.get(name) is not None and not isinstance(row[name], str):
+            return RowError(f'поле {name} не строка: {row[name]!r}')
+    if not row.get('author'):
+        return RowError('нет автора')
+    return row
+
+
+def write_rows(stream, rows, fmt):
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+        return
+    for row in rows:
+        stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def export_rows(queryset=None, chunk_size=2000):
+    """Посты в порядке id, курсором по chunk_size строк."""
+    queryset = Post.objects.all() if queryset is None else queryset
+    rows = (queryset.order_by('pk')
+            .values_list('pk', 'text', 'pub_date', 'author__username',
+                         'group__slug', 'group__title', 'image')
+            .iterator(chunk_size=chunk_size))
+    for pk, text, pub_date, author, group, group_title, image in rows:
+        yield {'id': pk, 'text': text, 'pub_date': pub_date.isoformat(),
+               'author': author, 'group': group or '',
+               'group_title': group_title or '', 'image': image or ''}
+
+
+class Resolver:
+    """Кэш username/slug → id; неизвестные ключи добираются пачкой."""
+
+    def __init__(self, create_missing=False):
+        self.create_missing = create_missing
+        self.authors = {}
+        self.groups = {}
+
+    def prefetch(self, rows):
+        # Негодные записи отбросит build_post, здесь они только мешают:
+        # список вместо username не положить в множество.
+        rows = [row for row in rows
+                if not isinstance(check_row(row), RowError)]
+        usernames = {row['author'] for row in rows} - self.authors.keys()
+        if usernames:
+            self.authors.update(User.objects.filter(
+                username__in=usernames).values_list('username', 'pk'))
+            missing = usernames - self.authors.keys()
+            if missing and self.create_missing:
+                User.objects.bulk_create(
+                    [self._new_user(name) for name in missing],
+                    ignore_conflicts=True)
+                self.authors.update(User.objects.filter(
+                    username__in=missing).values_list('username', 'pk'))
+        slugs = ({row['group'] for row in rows if row.get('group')}
+                 - self.groups.keys())
+        if slugs:
+            self.groups.update(Group.objects.filter(
+                slug__in=slugs).values_list('slug', 'pk'))
+            missing = slugs - self.groups.keys()
+            if missing and self.create_missing:
+                titles = {row['group']: row.get('group_title') or row['group']
+                          for row in rows if row.get('group') in missing}
+                Group.objects.bulk_create(
+                    [Group(slug=slug, title=title, description='')
+                     for slug, title in titles.items()],
+                    ignore_conflicts=True)
+                self.groups.update(Group.objects.filter(
+                    slug__in=missing).values_list('slug', 'pk'))
+
+    def _new_user(self, username):
+        user = User(username=username)
+        user.set_unusable_password()
+        return user
+
+    def author_id(self, username):
+        try:
+            return self.authors[username]
+        except KeyError:
+            raise RowError(f'неизвестный автор {username!r}') from None
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        try:
+            return self.groups[slug]
+        except KeyError:
+            raise RowError(f'неизвестная группа {slug!r}') from None
+
+
+def build_post(row, resolver, now):
+    row = check_row(row)
+    if isinstance(row, RowError):
+        raise row
+    if not row.get('text'):
+        raise RowError('пустой текст')
+    pub_date = now
+    if row.get('pub_date'):
+        try:
+            pub_date = parse_datetime(row['pub_date'])
+        except (ValueError, TypeError):
+            # Правильный формат, но невозможная дата: 2024-13-01.
+            pub_date = None
+        if pub_date is None:
+            raise RowError(f'неверная дата {row["pub_date"]!r}')
+        if timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date, dt.timezone.utc)
+    return Post(text=row['text'], pub_date=pub_date,
+                author_id=resolver.author_id(row['author']),
+                group_id=resolver.group_id(row.get('group')),
+                image=row.get('image') or None)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ImportScope:
+    """Что записал импорт: по нему rebuild_derived пересчитывает только
+    затронутые строки. post_range — (первый, последний) id постов."""
+
+    def __init__(self):
+        self.post_range = None
+        self.author_ids = set()
+        self.group_ids = set()
+        # bulk_create вернул id не для всех постов (не все СУБД это
+        # умеют) — пересобирать придётся всё.
+        self.complete = True
+
+    def add(self, posts):
+        ids = [post.pk for post in posts]
+        if None in ids:
+            self.complete = False
+            return
+        if ids:
+            low, high = self.post_range or (min(ids), max(ids))
+            self.post_range = (min(low, *ids), max(high, *ids))
+        self.author_ids.update(post.author_id for post in posts)
+        self.group_ids.update(post.group_id for post in posts
+                              if post.group_id)
+
+
+def import_posts(rows, batch_size=1000, create_missing=False,
+                 on_error=None, on_batch=None, scope=None):
+    """Пишет посты пачками bulk_create, каждая пачка — своя транзакция.
+
+    bulk_create не вызывает сигналы, поэтому счётчики, ленты подписок и
+    поисковый индекс нужно пересобрать после импорта: см. rebuild_derived
+    и ``scope`` (ImportScope). Возвращает (импортировано, пропущено).
+    """
+    resolver = Resolver(create_missing)
+    imported = skipped = 0
+    with explicit_dates(Post, 'pub_date'):
+        for number, batch in enumerate(batches(rows, batch_size)):
+            now = timezone.now()
+            posts = []
+            with transaction.atomic():
+                resolver.prefetch(batch)
+                for offset, row in enumerate(batch):
+                    try:
+                        posts.append(build_post(row, resolver, now))
+                    except RowError as error:
+                        skipped += 1
+                        if on_error is not None:
+                            on_error(number * batch_size + offset + 1,
+                                     error)
+                Post.objects.bulk_create(posts, batch_size=batch_size)
+            imported += len(posts)
+            if scope is not None:
+                scope.add(posts)
+            if on_batch is not None:
+                on_batch(imported, skipped)
+    return imported, skipped
+
+
+def rebuild_derived(scope=None):
+    """Всё, что при обычном сохранении поддерживают сигналы.
+
+    С ``scope`` — только для импортированных постов, их авторов, групп и
+    подписчиков этих авторов.
+    """
+    if scope is not None and not scope.complete:
+        scope = None
+    if scope is None:
+        steps = (('counters', counters.reconcile),
+                 ('search', get_search_backend().reindex),
+                 ('timelines', get_timeline().rebuild))
+    else:
+        posts = (Post.objects.filter(pk__range=scope.post_range)
+                 if scope.post_range else Post.objects.none())
+        followers = Follow.objects.filter(
+            author__in=scope.author_ids).values('user').distinct()
+        steps = (
+            ('counters', lambda: counters.reconcile(
+                users=scope.author_ids, groups=scope.group_ids)),
+            ('search', lambda: get_search_backend().reindex(posts=posts)),
+            ('timelines', lambda: get_timeline().rebuild(users=followers)),
+        )
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - start
+    bump_version()
+    return timings
@@ -0,0 +1,114 @@
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from PIL import Image
+
+from .metrics import metrics
+
+DEFAULTS = {
+    'MAX_BYTES': 10 * 2**20,
+    'MAX_PIXELS': 40_000_000,
+    'FORMATS': ('JPEG', 'PNG', 'GIF', 'WEBP'),
+    # Сколько байт начала файла копить, чтобы прочитать заголовок.
+    'HEADER_BYTES': 256 * 2**10,
+    # Оригиналы с большей стороной длиннее уменьшаются; None — не трогать.
+    'DOWNSCALE_TO': 2560,
+}
+
+
+def get_limits():
+    return {**DEFAULTS, **getattr(settings, 'UPLOAD_LIMITS', {})}
+
+
+def rejected_uploads(request):
+    return getattr(request, 'rejected_uploads', {})
+
+
+class LimitedImageUploadHandler(FileUploadHandler):
+    """Первый обработчик в FILE_UPLOAD_HANDLERS: проверка на лету.
+
+    Считает байты и по заголовку определяет формат и размеры картинки,
+    не декодируя её. Файл сверх лимитов пропускается (SkipFile) ещё до
+    записи на диск, причина сохраняется в request.rejected_uploads для
+    формы. Сами данные копят следующие обработчики: до
+    FILE_UPLOAD_MAX_MEMORY_SIZE в памяти, дальше — во временном файле.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.limits = get_limits()
+        self.received = 0
+        self.head = b''
+        self.checked = False
+        self.started = time.perf_counter()
+        if self.content_length and (
+                self.content_length > self.limits['MAX_BYTES']):
+            self.reject('size', 'Файл больше %s МБ.'
+                        % (self.limits['MAX_BYTES'] // 2**20))
+
+    def reject(self, reason, message):
+        if self.request is not None:
+            if not hasattr(self.request, 'rejected_uploads'):
+                self.request.rejected_uploads = {}
+            self.request.rejected_uploads[self.field_name] = message
+        metrics.inc('upload_rejected_total', reason=reason)
+        raise SkipFile(message)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.limits['MAX_BYTES']:
+            self.reject('size', 'Файл больше %s МБ.'
+                        % (self.limits['MAX_BYTES'] // 2**20))
+        if not self.checked:
+            self.head += raw_data
+            self.check_header()
+        return raw_data
+
+    def check_header(self):
+        try:
+            # open() ленивый: читает только заголовок, пиксели не трогает.
+            with Image.open(BytesIO(self.head)) as image:
+                fmt, (width, height) = image.format, image.size
+        except Exception:
+            if len(self.head) >= self.limits['HEADER_BYTES']:
+                # Не картинка — пусть ImageField выдаст свою ошибку.
+                self.checked = True
+                self.head = b''
+            return
+        self.checked = True
+        self.head = b''
+        if fmt not in self.limits['FORMATS']:
+            self.reject('format', 'Формат %s не поддерживается.' % fmt)
+        if width * height > self.limits['MAX_PIXELS']:
+            self.reject('pixels', 'Слишком большое изображение: %s×%s.'
+                        % (width, height))
+
+    def file_complete(self, file_size):
+        metrics.observe('upload_bytes', file_size)
+        metrics.observe('upload_receive_seconds',
+                        time.perf_counter() - self.started)
+        # Файл собирают следующие обработчики.
+        return None
+
+
+def downscale(uploaded, max_side):
+    """Уменьшает оригинал до max_side по большей стороне.
+
+    Для JPEG используется draft(): декодер сразу читает уменьшенную
+    копию, не разворачивая в памяти полный кадр.
+    """
+    uploaded.seek(0)
+    image = Image.open(uploaded)
+    fmt = image.format
+    if max(image.size) <= max_side:
+        uploaded.seek(0)
+        return None
+    image.draft('RGB', (max_side, max_side))
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, fmt, quality=90)
+    return buffer.getvalue(), fmt
@@ -1,15 +1,30 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Под ASGI ленты, профиль и пост можно отдавать асинхронными
+# представлениями с тем же контекстом шаблонов.
+if getattr(settings, 'ASYNC_VIEWS', False):
+    from . import async_views as feed_views
+else:
+    feed_views = views
+
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('group/<slug:slug>/', views.group_posts, name='group_post'),
+    path('', feed_views.index, name='index'),
+    path('group/<slug:slug>/', feed_views.group_posts, name='group_post'),
     path('new/', views.new_post, name='new_post'),
-    path('follow/', views.follow_index, name='follow_index'),
-    path('<str:username>/', views.profile, name='profile'),
-    path('<str:username>/<int:post_id>/', views.post_view, name='post'),
+    path('follow/', feed_views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('<str:username>/', feed_views.profile, name='profile'),
+    path('<str:username>/followers/', views.profile_followers,
+         name='profile_followers'),
+    path('<str:username>/following/', views.profile_following,
+         name='profile_following'),
+    path('<str:username>/<int:post_id>/', feed_views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/',
          views.post_edit, name='post_edit'),
+    path('<str:username>/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
     path("<str:username>/<int:post_id>/comment",
          views.add_comment, name="add_comment"),
     path("<str:username>/follow/", views.profile_follow,
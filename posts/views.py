@@ -1,77 +1,181 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import JsonResponse
+from django.urls import reverse
 
 from .models import Post, Group, User, Comment, Follow
 from .forms import PostForm, CommentForm
+from . import ingest, renditions
+from .counters import get_user_stats, post_group_changed
+from .feed_cache import feed_cache_context
+from .follow_graph import following_many, is_following
+from .pagination import CursorPaginator, paginate
+from .querylog import query_budget
+from .routers import replica_reads
+from .search import get_search_backend
+from .timeline import get_timeline
+from .uploads import rejected_uploads
 
 import datetime as dt
 
+COMMENTS_PER_PAGE = 20
+FOLLOWS_PER_PAGE = 30
+SEARCH_PER_PAGE = 10
+# Запросов к БД на страницу ленты, включая сессию и пользователя;
+# не должно зависеть от числа постов и комментариев.
+FEED_QUERY_BUDGET = 8
 
+
+@query_budget(FEED_QUERY_BUDGET)
+@replica_reads
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    context = {'page': page, 'paginator': paginator}
+    post_list = Post.objects.for_feed()
+    page, paginator = paginate(request, post_list, 10)
+    context = {'page': page, 'paginator': paginator,
+               **feed_cache_context(request)}
     return render(request, 'index.html', context)
 
 
+@query_budget(FEED_QUERY_BUDGET)
+@replica_reads
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 5)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = group.posts.for_feed()
+    page, paginator = paginate(request, post_list, 5,
+                               count=group.posts_count)
     return render(request, 'group.html',
-                  {'group': group, 'page': page, 'paginator': paginator})
+                  {'group': group, 'page': page, 'paginator': paginator,
+                   **feed_cache_context(request)})
+
+
+@query_budget(FEED_QUERY_BUDGET)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = None
+    if query:
+        page = get_search_backend().search(
+            query, request.GET.get('cursor'), SEARCH_PER_PAGE)
+    return render(request, 'search.html', {'query': query, 'page': page,
+                                           'paginator': page})
 
 
 @login_required
 def new_post(request):
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    form = PostForm(request.POST or None, files=request.FILES or None,
+                    rejected_uploads=rejected_uploads(request))
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if post.image:
+            renditions.schedule(post)
         return redirect('index')
     return render(request, 'new_post.html', {'form': form})
 
 
+@query_budget(FEED_QUERY_BUDGET)
+@replica_reads
 def profile(request, username):
     profile = get_object_or_404(User, username=username)
-    following = False
-    if request.user.is_authenticated:
-        authors_list = [i[0] for i in
-                        request.user.follower.all().values_list('author')]
-        if profile.pk in authors_list:
-            following = True
-    posts_list = profile.posts.all()
-    paginator = Paginator(posts_list, 5)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    following = is_following(request.user, profile)
+    stats = get_user_stats(profile)
+    posts_list = profile.posts.for_feed()
+    page, paginator = paginate(request, posts_list, 5,
+                               count=stats.posts_count)
     return render(request, 'profile.html', {'profile': profile,
+                                            'stats': stats,
                                             'page': page,
                                             'paginator': paginator,
-                                            'following': following})
+                                            'following': following,
+                                            **feed_cache_context(request)})
+
+
+def follow_list(request, username, direction):
+    """Подписчики или подписки пользователя, курсорные страницы по id."""
+    profile = get_object_or_404(User, username=username)
+    if direction == 'followers':
+        edges = Follow.objects.filter(author=profile)
+        other = 'user'
+    else:
+        edges = Follow.objects.filter(user=profile)
+        other = 'author'
+    paginator = CursorPaginator(edges.select_related(other), FOLLOWS_PER_PAGE,
+                                keys=(other + '_id',), ascending=True)
+    page = paginator.get_page(request.GET.get('cursor'))
+    people = [getattr(edge, other) for edge in page]
+    return render(request, 'follow_list.html', {
+        'profile': profile,
+        'stats': get_user_stats(profile),
+        'following': is_following(request.user, profile),
+        'direction': direction,
+        'people': people,
+        'followed': following_many(request.user, people),
+        'page': page,
+        'paginator': paginator,
+    })
+
 
+@query_budget(FEED_QUERY_BUDGET)
+def profile_followers(request, username):
+    return follow_list(request, username, 'followers')
 
+
+@query_budget(FEED_QUERY_BUDGET)
+def profile_following(request, username):
+    return follow_list(request, username, 'following')
+
+
+@query_budget(FEED_QUERY_BUDGET)
+@replica_reads
 def post_view(request, username, post_id):
     profile = get_object_or_404(User, username=username)
-    following = False
-    if request.user.is_authenticated:
-        authors_list = [i[0] for i in
-                    request.user.follower.all().values_list('author')]
-        if profile.pk in authors_list:
-            following = True
-    post = get_object_or_404(profile.posts, id=post_id)
-    comments = Comment.objects.filter(post=post_id)
+    following = is_following(request.user, profile)
+    post = get_object_or_404(profile.posts.for_feed(), id=post_id)
     form = CommentForm()
-    return render(request, 'post.html', {'profile': profile,
-                                         'post': post,
-                                         'comments': comments,
-                                         'form': form,
-                                         'following': following})
+    return render(request, 'post.html', {
+        'profile': profile,
+        'stats': get_user_stats(profile),
+        'post': post,
+        'form': form,
+        'following': following,
+        'pending_comments': ingest.pending_comments(request.user, post_id),
+        **comments_context(request, username, post_id),
+    })
+
+
+def comments_context(request, username, post_id):
+    comments = Comment.objects.filter(post=post_id).select_related('author')
+    paginator = CursorPaginator(comments, COMMENTS_PER_PAGE,
+                                keys=('created', 'pk'), ascending=True)
+    page = paginator.get_page(request.GET.get('cursor'))
+    context = {'comment_page': page}
+    if page.has_next():
+        # Остальные параметры (format=json) переходят в следующую ссылку.
+        query = request.GET.copy()
+        query['cursor'] = page.next_cursor
+        context['next_url'] = '%s?%s' % (
+            reverse('post_comments', args=(username, post_id)),
+            query.urlencode())
+        context['more_url'] = '%s?cursor=%s' % (
+            reverse('post', args=(username, post_id)), page.next_cursor)
+    return context
+
+
+@query_budget(FEED_QUERY_BUDGET)
+def post_comments(request, username, post_id):
+    """Следующие страницы комментариев: HTML-фрагмент или JSON."""
+    get_object_or_404(Post, pk=post_id, author__username=username)
+    context = comments_context(request, username, post_id)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [{'id': item.pk,
+                          'author': item.author.username,
+                          'text': item.text,
+                          'created': item.created.isoformat()}
+                         for item in context['comment_page']],
+            'next': context.get('next_url'),
+        })
+    return render(request, 'comment_list.html', context)
 
 
 @login_required
@@ -79,10 +183,17 @@ def add_comment(request, username, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.post = post
-        comment.author = request.user
-        comment.save()
+        if ingest.enabled():
+            try:
+                ingest.enqueue_comment(request.user, post,
+                                       form.cleaned_data['text'])
+            except ingest.QueueFull:
+                return ingest.busy_response()
+        else:
+            comment = form.save(commit=False)
+            comment.post = post
+            comment.author = request.user
+            comment.save()
         return redirect('post', username=username, post_id=post_id)
     return redirect('post', username=username, post_id=post_id)
 
@@ -93,44 +204,59 @@ def post_edit(request, username, post_id):
     post = profile.posts.get(id=post_id)
     if request.user != profile:
         return redirect('post', username, post_id)
+    old_group_id = post.group_id
     form = PostForm(request.POST or None, files=request.FILES or None,
-                    instance=post)
+                    instance=post,
+                    rejected_uploads=rejected_uploads(request))
     if form.is_valid():
         post.pub_date = dt.datetime.now() + dt.timedelta(hours=3)
         post.save()
+        post_group_changed(post, old_group_id)
+        if 'image' in form.changed_data and post.image:
+            renditions.schedule(post)
         return redirect('post', username, post_id)
     return render(request, 'post_edit.html', {'form': form,
                                               'profile': profile,
                                               'post': post})
 
 
+@query_budget(FEED_QUERY_BUDGET)
+@replica_reads
 @login_required
 def follow_index(request):
-    authors_list = request.user.follower.all().values('author')
-    post_list = Post.objects.filter(author__in=authors_list)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, "follow.html", {'page': page,
-                                           'paginator': paginator})
+    post_list = get_timeline().posts(request.user).for_feed()
+    page, paginator = paginate(request, post_list, 10)
+    return render(request, "follow.html", {
+        'page': page,
+        'paginator': paginator,
+        **feed_cache_context(request, 'user:%s' % request.user.pk),
+    })
 
 
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    authors_list = [
-        i[0] for i in request.user.follower.all().values_list('author')
-    ]
-    if request.user != author and author.pk not in authors_list:
-        Follow.objects.create(user=request.user, author=author)
+    if request.user == author:
         return redirect('follow_index')
+    if ingest.enabled():
+        # Очередь дубли не отсекает: повторная подписка в неё не идёт.
+        if is_following(request.user, author):
+            return redirect('follow_index')
+        try:
+            ingest.enqueue_follow(request.user, author)
+        except ingest.QueueFull:
+            return ingest.busy_response()
+    else:
+        # Гонки двух запросов отсекает UniqueConstraint(user, author).
+        Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('follow_index')
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.get(user=request.user, author=author).delete()
+    ingest.cancel_follow(request.user, author)
+    Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('follow_index')
 
 
@@ -0,0 +1,15 @@
+from django.urls import include, path
+
+from posts import async_views
+
+# Асинхронные представления перекрывают синхронные, остальные маршруты
+# (и имена для reverse в шаблонах) — из основного urls.py.
+urlpatterns = [
+    path('', async_views.index, name='index'),
+    path('group/<slug:slug>/', async_views.group_posts, name='group_post'),
+    path('follow/', async_views.follow_index, name='follow_index'),
+    path('<str:username>/', async_views.profile, name='profile'),
+    path('<str:username>/<int:post_id>/', async_views.post_view,
+         name='post'),
+    path('', include('mydict.urls')),
+]
@@ -1,4 +1,26 @@
+import pytest
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def sync_renditions(settings):
+    # Версии картинок строим в потоке теста, без пула.
+    settings.IMAGE_RENDITIONS = {'WORKERS': 0}
+
+
+@pytest.fixture(autouse=True)
+def query_budgets(settings):
+    # Представление с query_budget, превысившее бюджет, роняет тест.
+    settings.QUERY_LOG = {'ENABLED': True, 'RAISE': True}
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    # Id строк после очистки БД повторяются, а кэш процесса — общий.
+    yield
+    from django.core.cache import cache
+    cache.clear()
@@ -0,0 +1,111 @@
+import pytest
+from django.core.cache import cache
+from django.utils.http import http_date
+
+from posts.api import PER_PAGE
+from posts.models import Comment, Follow, Post
+
+
+@pytest.fixture
+def many_posts(user, group):
+    return [Post.objects.create(text=f'Пост {i}', author=user, group=group)
+            for i in range(PER_PAGE + 3)]
+
+
+class TestFeedApi:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_projection_and_cursor(self, client, many_posts,
+                                   django_assert_max_num_queries):
+        with django_assert_max_num_queries(6):
+            response = client.get('/api/')
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data['results']) == PER_PAGE
+        item = data['results'][0]
+        assert item['id'] == many_posts[-1].pk
+        assert item['author'] == 'TestUser'
+        assert item['group'] == {'slug': 'test-link',
+                                 'title': 'Тестовая группа 1'}
+        assert set(item) == {'id', 'text', 'pub_date', 'author', 'group',
+                             'comment_count', 'image', 'card'}
+        data = client.get(data['next']).json()
+        assert [row['id'] for row in data['results']] == [
+            post.pk for post in reversed(many_posts[:3])]
+        assert data['next'] is None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_group_and_profile(self, client, many_posts, post):
+        data = client.get('/api/group/test-link/').json()
+        assert post.pk not in [row['id'] for row in data['results']]
+        data = client.get('/api/TestUser/').json()
+        assert data['results'][0]['id'] == post.pk
+        assert client.get('/api/group/missing/').status_code == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_requires_login(self, client, user_client, user,
+                                   django_user_model):
+        author = django_user_model.objects.create_user(username='Author')
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(text='Для подписчиков', author=author)
+        data = user_client.get('/api/follow/').json()
+        assert [row['id'] for row in data['results']] == [post.pk]
+        client.logout()
+        response = client.get('/api/follow/')
+        assert response.status_code == 403
+        assert response['Content-Type'] == 'application/json'
+
+
+class TestConditionalGet:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_etag_not_modified(self, client, many_posts,
+                               django_assert_max_num_queries):
+        response = client.get('/api/')
+        etag = response['ETag']
+        assert etag.startswith('"')
+        with django_assert_max_num_queries(1):
+            response = client.get('/api/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response.content == b''
+
+        Post.objects.create(text='Новый', author=many_posts[0].author)
+        response = client.get('/api/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    @pytest.mark.django_db(transaction=True)
+    def test_etag_follows_content_not_cache(self, client, many_posts):
+        etag = client.get('/api/')['ETag']
+        # Версии кэша сбрасываются, а ответ тот же.
+        cache.clear()
+        response = client.get('/api/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        # Правка в обход сигналов не трогает версии кэша.
+        Post.objects.filter(pk=many_posts[-1].pk).update(text='Исправлено')
+        response = client.get('/api/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    @pytest.mark.django_db(transaction=True)
+    def test_last_modified(self, client, many_posts):
+        response = client.get('/api/')
+        newest = max(post.pub_date for post in many_posts)
+        assert response['Last-Modified'] == http_date(newest.timestamp())
+        response = client.get(
+            '/api/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == 304
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_detail_changes_with_comments(self, client, post, user):
+        url = f'/api/{user.username}/{post.pk}/'
+        response = client.get(url)
+        data = response.json()
+        assert data['post']['id'] == post.pk
+        assert data['comments'] == [] and data['more_comments'] is None
+        etag = response['ETag']
+        Comment.objects.create(post=post, author=user, text='Первый')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()['comments'][0]['author'] == user.username
@@ -0,0 +1,91 @@
+import re
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+
+from posts import counters
+from posts.models import Comment, Follow
+
+# Ключи контекста, которые сравниваются с синхронными представлениями.
+KEYS = ('profile', 'stats', 'following', 'feed_cache_key', 'comment_page',
+        'group')
+
+# CSRF-токен формы комментария свой у каждого ответа.
+CSRF = re.compile(rb'name="csrfmiddlewaretoken" value="[^"]*"')
+
+
+def get(client, url):
+    if isinstance(client, AsyncClient):
+        return async_to_sync(client.get)(url)
+    return client.get(url)
+
+
+def summary(response):
+    context = response.context
+    page = context.get('page') or []
+    return {
+        'status': response.status_code,
+        'posts': [post.pk for post in page],
+        **{key: (list(context[key]) if key == 'comment_page'
+                 else context[key])
+           for key in KEYS if key in context},
+    }
+
+
+@pytest.fixture
+def author(django_user_model, post_with_group):
+    author = django_user_model.objects.create_user(username='author')
+    post = post_with_group
+    post.author = author
+    post.save()
+    Comment.objects.create(post=post, author=author, text='Первый')
+    # Смена автора в обход сигналов: счётчики пересчитываем сами.
+    counters.reconcile()
+    return author
+
+
+@pytest.mark.urls('tests.async_urls')
+class TestAsyncViews:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_same_context_as_sync_views(self, user, author,
+                                        post_with_group):
+        Follow.objects.create(user=user, author=author)
+        post = post_with_group
+        urls = ['/', f'/group/{post.group.slug}/', '/follow/',
+                f'/{author.username}/', f'/{author.username}/{post.pk}/',
+                f'/{author.username}/{post.pk + 100}/']
+        sync_client, async_client = Client(), AsyncClient()
+        sync_client.force_login(user)
+        async_client.force_login(user)
+        for url in urls:
+            expected = get(sync_client, url)
+            response = get(async_client, url)
+            assert response.status_code == expected.status_code, url
+            if expected.status_code == 200:
+                assert summary(response) == summary(expected), url
+                assert (CSRF.sub(b'', response.content)
+                        == CSRF.sub(b'', expected.content)), url
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_index_requires_login(self):
+        response = get(AsyncClient(), '/follow/')
+        assert response.status_code == 302
+        assert '/auth/login/' in response.url
+
+    @pytest.mark.django_db(transaction=True)
+    def test_anonymous_profile(self, author):
+        response = get(AsyncClient(), f'/{author.username}/')
+        assert response.status_code == 200
+        assert response.context['following'] is False
+        assert response.context['stats'].posts_count == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_query_budget_counts_async_queries(self, author, monkeypatch):
+        from posts import async_views
+        from posts.querylog import QueryBudgetExceeded
+
+        monkeypatch.setattr(async_views.index, 'query_budget', 0)
+        with pytest.raises(QueryBudgetExceeded, match='при бюджете 0'):
+            get(AsyncClient(), '/')
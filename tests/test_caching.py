@@ -0,0 +1,49 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+from posts.caching import get_or_set
+
+
+class TestGetOrSet:
+
+    def test_only_one_worker_recomputes(self):
+        cache.delete('test:stampede')
+        calls = []
+
+        def producer():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                get_or_set('test:stampede', producer, 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert results == ['value'] * 8
+
+    def test_early_recomputation_near_expiry(self):
+        cache.delete('test:early')
+        get_or_set('test:early', lambda: 'old', 60)
+        value, delta, expiry = cache.get('test:early')
+        # Вычисление «длилось» дольше оставшегося срока — пересчёт неизбежен.
+        cache.set('test:early', (value, 3600, expiry), 60)
+        assert get_or_set('test:early', lambda: 'new', 60) == 'new'
+        assert get_or_set('test:early', lambda: 'newer', 60) == 'new'
+
+    def test_stale_value_served_while_locked(self):
+        cache.delete('test:stale')
+        cache.set('test:stale', ('old', 3600, time.time() + 1), 60)
+        cache.add('test:stale:lock', 1, 10)
+        try:
+            assert get_or_set('test:stale', lambda: 'new', 60) == 'old'
+        finally:
+            cache.delete('test:stale:lock')
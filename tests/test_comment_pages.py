@@ -0,0 +1,41 @@
+import pytest
+
+from posts.models import Comment
+from posts.views import COMMENTS_PER_PAGE
+
+
+@pytest.fixture
+def many_comments(post, user):
+    return [Comment.objects.create(post=post, author=user, text=f'Коммент {i}')
+            for i in range(COMMENTS_PER_PAGE + 5)]
+
+
+class TestCommentPages:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_first_page_and_fragment(self, client, post, many_comments,
+                                     django_assert_max_num_queries):
+        url = f'/{post.author.username}/{post.pk}/'
+        with django_assert_max_num_queries(8):
+            response = client.get(url)
+        page = response.context['comment_page']
+        assert [c.pk for c in page] == [c.pk for c in
+                                        many_comments[:COMMENTS_PER_PAGE]]
+        next_url = response.context['next_url']
+        assert next_url in response.content.decode()
+
+        response = client.get(next_url)
+        assert 'Коммент 24' in response.content.decode()
+        assert 'Коммент 0<' not in response.content.decode()
+        assert 'next_url' not in response.context
+
+    @pytest.mark.django_db(transaction=True)
+    def test_json_fragment(self, client, post, many_comments):
+        response = client.get(
+            f'/{post.author.username}/{post.pk}/comments/?format=json')
+        data = response.json()
+        assert len(data['comments']) == COMMENTS_PER_PAGE
+        assert data['comments'][0]['author'] == post.author.username
+        assert 'format=json' in data['next']
+        data = client.get(data['next']).json()
+        assert len(data['comments']) == 5 and data['next'] is None
@@ -0,0 +1,58 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from posts.counters import get_user_stats
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+
+class TestCounters:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_counters_follow_writes(self, user, group):
+        author = get_user_model().objects.create_user(username='author')
+        post = Post.objects.create(text='пост', author=author, group=group)
+        Comment.objects.create(post=post, author=user, text='комментарий')
+        Follow.objects.create(user=user, author=author)
+
+        post.refresh_from_db()
+        group.refresh_from_db()
+        assert post.comment_count == 1
+        assert group.posts_count == 1
+        assert author.stats.posts_count == 1
+        assert author.stats.followers_count == 1
+        assert UserStats.objects.get(user=user).following_count == 1
+
+        Follow.objects.all().delete()
+        post.delete()
+        group.refresh_from_db()
+        assert group.posts_count == 0
+        stats = UserStats.objects.get(user=author)
+        assert stats.posts_count == 0 and stats.followers_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_user_delete_cascades(self, user, post):
+        author = get_user_model().objects.create_user(username='author')
+        Follow.objects.create(user=user, author=author)
+        UserStats.objects.all().delete()
+        user.delete()
+        assert not UserStats.objects.filter(user=user.pk).exists()
+        assert get_user_stats(author).followers_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reconcile_repairs_drift(self, post_with_group):
+        Post.objects.update(comment_count=42)
+        Group.objects.update(posts_count=0)
+        UserStats.objects.all().delete()
+        call_command('reconcile_counters')
+
+        post_with_group.refresh_from_db()
+        assert post_with_group.comment_count == 0
+        assert Group.objects.get().posts_count == 1
+        assert post_with_group.author.stats.posts_count == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_profile_shows_counters(self, client, post):
+        response = client.get(f'/{post.author.username}/')
+        assert response.context['stats'].posts_count == 1
+        assert 'Posts: 1' in response.content.decode()
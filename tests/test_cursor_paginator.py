@@ -0,0 +1,85 @@
+import pytest
+from django.test import override_settings
+
+from posts.pagination import CursorPage, CursorPaginator, encode_cursor
+
+
+@pytest.fixture
+def many_posts(user):
+    from posts.models import Post
+    return [Post.objects.create(text=f'Пост {i}', author=user)
+            for i in range(12)]
+
+
+class TestCursorPaginator:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_walks_forward_and_back(self, many_posts):
+        from posts.models import Post
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+        first = paginator.get_page()
+        assert list(first) == expected[:5]
+        assert first.has_next() and not first.has_previous()
+
+        second = paginator.get_page(first.next_cursor)
+        assert list(second) == expected[5:10]
+        assert second.number == 2
+
+        third = paginator.get_page(second.next_cursor)
+        assert list(third) == expected[10:]
+        assert not third.has_next()
+
+        back = paginator.get_page(third.previous_cursor)
+        assert list(back) == expected[5:10]
+        assert back.number == 2
+        assert back.previous_cursor == ''
+
+    @pytest.mark.django_db(transaction=True)
+    def test_invalid_cursor_falls_back_to_first_page(self, many_posts):
+        from posts.models import Post
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        assert paginator.get_page('garbage!').number == 1
+        assert paginator.get_page(encode_cursor(['x', 'y'])).number == 1
+        impossible = encode_cursor(['2024-13-01T00:00:00', 1], 'next', 2)
+        assert paginator.get_page(impossible).number == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feed_views_accept_cursor(self, client, many_posts):
+        with override_settings(FEED_PAGINATION='cursor'):
+            response = client.get('/TestUser/')
+            page = response.context['page']
+            assert type(page) == CursorPage
+            response = client.get(f'/TestUser/?cursor={page.next_cursor}')
+        assert len(response.context['page']) == 5
+        assert response.context['page'].number == 2
+        assert 'cursor=' in response.content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('cursor', [
+        # Хвост ленты удалён / переполненный pk.
+        encode_cursor(['2000-01-01T00:00:00+00:00', 1], 'next', 3),
+        encode_cursor(['2000-01-01T00:00:00+00:00', 10 ** 30], 'next', 3),
+        # prev за самым новым постом.
+        encode_cursor(['2099-01-01T00:00:00+00:00', 1], 'prev', 1),
+    ])
+    def test_empty_cursor_page_falls_back(self, client, many_posts, cursor):
+        from posts.models import Post
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        page = paginator.get_page(cursor)
+        assert page.number == 1 and not page.has_previous()
+        assert list(page) == list(
+            Post.objects.order_by('-pub_date', '-pk')[:5])
+        assert page.next_cursor
+
+        for url in ('/', '/TestUser/', '/api/'):
+            response = client.get(url, {'cursor': cursor})
+            assert response.status_code == 200, url
+
+    @pytest.mark.django_db(transaction=True)
+    def test_empty_page_has_no_cursors(self, many_posts):
+        from posts.models import Post
+        page = CursorPaginator(Post.objects.none(), 5).get_page()
+        page._has_next = page._has_previous = True
+        assert page.next_cursor is None and page.previous_cursor is None
@@ -0,0 +1,55 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from posts.models import Follow, Post
+
+
+class TestFeedCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages_and_viewers_do_not_share_entries(self, user_client, user):
+        for i in range(12):
+            Post.objects.create(text=f'Пост номер {i}', author=user)
+        first = user_client.get('/').content.decode()
+        second = user_client.get('/?page=2').content.decode()
+        assert 'Пост номер 11' in first and 'Пост номер 11' not in second
+        assert 'Пост номер 0' in second
+
+        # Пустая лента подписок не берётся из кеша общей ленты.
+        response = user_client.get('/follow/')
+        assert 'Пост номер' not in response.content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_writes_invalidate_fragments(self, user_client, user):
+        author = get_user_model().objects.create_user(username='author')
+        Post.objects.create(text='Первый пост', author=author)
+        assert 'Первый пост' in user_client.get('/').content.decode()
+        assert 'Первый пост' not in (
+            user_client.get('/follow/').content.decode())
+
+        Follow.objects.create(user=user, author=author)
+        assert 'Первый пост' in (
+            user_client.get('/follow/').content.decode())
+
+        Post.objects.create(text='Второй пост', author=author)
+        assert 'Второй пост' in user_client.get('/').content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cache_hit_skips_post_query(self, client, user,
+                                        django_assert_max_num_queries):
+        Post.objects.create(text='пост', author=user)
+        client.get(f'/{user.username}/?cursor=')
+        with django_assert_max_num_queries(2):
+            response = client.get(f'/{user.username}/?cursor=')
+        assert 'пост' in response.content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_renames_invalidate_fragments(self, client, user, group):
+        Post.objects.create(text='пост', author=user, group=group)
+        client.get('/')
+        group.title = 'Новое название'
+        group.save()
+        user.username = 'renamed'
+        user.save()
+        html = client.get('/').content.decode()
+        assert 'Новое название' in html and '@renamed' in html
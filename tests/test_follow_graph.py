@@ -0,0 +1,72 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from posts import follow_graph
+from posts.models import Follow
+
+
+@pytest.fixture
+def authors(django_user_model):
+    return [django_user_model.objects.create_user(username=f'author{i}')
+            for i in range(3)]
+
+
+class TestFollowGraph:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cached_set(self, user, authors, django_assert_num_queries):
+        Follow.objects.create(user=user, author=authors[0])
+        assert follow_graph.is_following(user, authors[0])
+        with django_assert_num_queries(0):
+            assert not follow_graph.is_following(user, authors[1])
+            assert follow_graph.following_many(user, authors) == {
+                authors[0].pk}
+        assert not follow_graph.is_following(user, user)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_invalidated_on_write(self, user, authors):
+        assert not follow_graph.is_following(user, authors[1])
+        follow = Follow.objects.create(user=user, author=authors[1])
+        assert follow_graph.is_following(user, authors[1])
+        follow.delete()
+        assert not follow_graph.is_following(user, authors[1])
+
+    @pytest.mark.django_db(transaction=True)
+    def test_stale_reader_cannot_overwrite_invalidation(self, user,
+                                                        authors):
+        from django.core.cache import cache
+        # Читатель взял ключ и прочитал подписки до подписки...
+        key = follow_graph.cache_key(user.pk)
+        Follow.objects.create(user=user, author=authors[2])
+        # ...и записал устаревшее множество после сброса.
+        cache.set(key, frozenset(), 3600)
+        assert follow_graph.is_following(user, authors[2])
+
+    @pytest.mark.django_db(transaction=True)
+    def test_exists_for_large_graphs(self, settings, user, authors,
+                                     django_assert_num_queries):
+        settings.FOLLOW_GRAPH = {'SET_LIMIT': 1}
+        for author in authors[:2]:
+            Follow.objects.create(user=user, author=author)
+        assert follow_graph.following_ids(user) is None
+        with django_assert_num_queries(1):
+            assert follow_graph.is_following(user, authors[1])
+        with django_assert_num_queries(1):
+            assert follow_graph.following_many(user, authors) == {
+                authors[0].pk, authors[1].pk}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_anonymous(self, client, authors):
+        response = client.get(f'/{authors[0].username}/')
+        assert response.context['following'] is False
+        assert follow_graph.following_many(
+            response.wsgi_request.user, authors) == set()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_profile_follow_is_idempotent(self, user_client, user, authors):
+        for _ in range(2):
+            user_client.get(f'/{authors[2].username}/follow/')
+        assert Follow.objects.filter(user=user).count() == 1
+        response = user_client.get(f'/{authors[2].username}/')
+        assert response.context['following'] is True
+        assert get_user_model().objects.count() == 4
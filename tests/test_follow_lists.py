@@ -0,0 +1,50 @@
+import struct
+
+import pytest
+from django.core.management import call_command
+
+from posts.models import Follow
+from posts.views import FOLLOWS_PER_PAGE
+
+
+@pytest.fixture
+def followers(user, django_user_model):
+    people = [django_user_model.objects.create_user(username=f'fan{i}')
+              for i in range(FOLLOWS_PER_PAGE + 2)]
+    for person in people:
+        Follow.objects.create(user=person, author=user)
+    return people
+
+
+class TestFollowLists:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_followers_pages(self, client, user, followers):
+        response = client.get(f'/{user.username}/followers/')
+        assert response.context['people'] == followers[:FOLLOWS_PER_PAGE]
+        assert 'fan0' in response.content.decode()
+        cursor = response.context['page'].next_cursor
+        response = client.get(f'/{user.username}/followers/?cursor={cursor}')
+        assert response.context['people'] == followers[FOLLOWS_PER_PAGE:]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_following_marks_viewer_state(self, client, user, followers):
+        Follow.objects.create(user=user, author=followers[1])
+        client.force_login(followers[0])
+        Follow.objects.create(user=followers[0], author=followers[1])
+        response = client.get(f'/{user.username}/following/')
+        assert response.context['people'] == [followers[1]]
+        assert response.context['followed'] == {followers[1].pk}
+        assert 'Отписаться' in response.content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_export_edges(self, tmp_path, user, followers):
+        csv_path, bin_path = tmp_path / 'edges.csv', tmp_path / 'edges.bin'
+        call_command('export_follows', str(csv_path))
+        call_command('export_follows', str(bin_path), '--format', 'binary')
+        lines = csv_path.read_text().splitlines()
+        assert lines[0] == 'user_id,author_id'
+        assert lines[1] == f'{followers[0].pk},{user.pk}'
+        edges = list(struct.iter_unpack('<II', bin_path.read_bytes()))
+        assert len(edges) == len(followers)
+        assert edges[0] == (followers[0].pk, user.pk)
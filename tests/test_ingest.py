@@ -0,0 +1,105 @@
+import pytest
+from django.core.management import call_command
+
+from posts import follow_graph, ingest
+from posts.instrumentation import render_metrics
+from posts.models import Comment, Follow, Post, UserStats
+
+
+@pytest.fixture
+def queue(settings, tmp_path):
+    settings.INGEST = {'ENABLED': True, 'BACKGROUND': False,
+                       'PATH': tmp_path / 'ingest.sqlite3'}
+    yield ingest.get_queue()
+    ingest.get_queue().close()
+
+
+@pytest.fixture
+def another_user(django_user_model):
+    return django_user_model.objects.create_user(username='Автор')
+
+
+@pytest.fixture
+def foreign_post(another_user):
+    return Post.objects.create(text='Чужой пост', author=another_user)
+
+
+class TestIngest:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comment_is_pending_until_flush(self, queue, user_client,
+                                            another_user, foreign_post):
+        post = foreign_post
+        url = f'/{another_user.username}/{post.pk}/'
+        response = user_client.post(url + 'comment', {'text': 'Скоро'})
+        assert response.status_code == 302
+        assert not Comment.objects.exists()
+        # Постановка в очередь — тоже запись: чтение с основной БД.
+        assert 'primary_until' in response.cookies
+        response = user_client.get(url)
+        assert [item['text'] for item in
+                response.context['pending_comments']] == ['Скоро']
+        assert 'отправляется' in response.content.decode()
+
+        assert ingest.flush() == 1
+        assert Comment.objects.get().text == 'Скоро'
+        post.refresh_from_db()
+        assert post.comment_count == 1
+        response = user_client.get(url)
+        assert response.context['pending_comments'] == []
+        assert queue.depth() == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_is_visible_before_flush(self, queue, user_client, user,
+                                            another_user, foreign_post):
+        response = user_client.get(f'/{another_user.username}/follow/')
+        assert 'primary_until' in response.cookies
+        user_client.get(f'/{another_user.username}/follow/')
+        assert queue.depth() == 1
+        response = user_client.get(f'/{another_user.username}/')
+        assert response.context['following'] is True
+
+        call_command('flush_ingest', '--once')
+        assert Follow.objects.filter(user=user, author=another_user).exists()
+        assert UserStats.objects.get(user=another_user).followers_count == 1
+        response = user_client.get('/follow/')
+        assert [item.pk for item in response.context['page']] == [
+            foreign_post.pk]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_unfollow_cancels_pending_follow(self, queue, user_client, user,
+                                             another_user):
+        user_client.get(f'/{another_user.username}/follow/')
+        user_client.get(f'/{another_user.username}/unfollow/')
+        assert queue.depth() == 0
+        assert ingest.flush() == 0
+        assert not Follow.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_unfollow_of_claimed_follow_is_queued(self, queue, user_client,
+                                                  user, another_user):
+        user_client.get(f'/{another_user.username}/follow/')
+        # Пачка уже у писателя: отписка не ждёт его, а оставляет отмену.
+        rows = queue.claim(10, lease=30)
+        user_client.get(f'/{another_user.username}/unfollow/')
+        assert not follow_graph.is_following(user, another_user)
+
+        ingest.write_follows([(user.pk, another_user.pk)])
+        queue.ack([row[0] for row in rows])
+        assert ingest.flush() == 1
+        assert queue.depth() == 0
+        assert not Follow.objects.exists()
+        assert UserStats.objects.get(user=another_user).followers_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_backpressure(self, queue, settings, user_client, post):
+        settings.INGEST = {**settings.INGEST, 'MAX_PENDING': 1,
+                           'RETRY_AFTER': 7}
+        url = f'/{post.author.username}/{post.pk}/comment'
+        assert user_client.post(url, {'text': 'раз'}).status_code == 302
+        response = user_client.post(url, {'text': 'два'})
+        assert response.status_code == 503
+        assert response['Retry-After'] == '7'
+        metrics = render_metrics()
+        assert 'ingest_queue_depth 1' in metrics
+        assert 'ingest_rejected_total{kind="comment"}' in metrics
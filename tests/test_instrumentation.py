@@ -0,0 +1,66 @@
+import pytest
+
+from posts.metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestInstrumentation:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_server_timing(self, client, post):
+        response = client.get('/')
+        timing = response['Server-Timing']
+        assert 'db;dur=' in timing and 'queries"' in timing
+        assert 'tpl;dur=' in timing and 'total;dur=' in timing
+        assert 'cache;desc="0/1 hits"' in timing
+        assert 'cache;desc="1/1 hits"' in client.get('/')['Server-Timing']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_scrape_endpoint(self, admin_client, post):
+        admin_client.get('/')
+        body = admin_client.get('/metrics/').content.decode()
+        assert '# TYPE http_requests_total counter' in body
+        assert 'http_requests_total{status="200",view="index"} 1' in body
+        assert '# TYPE db_queries summary' in body
+        assert 'db_queries_count{view="index"} 1' in body
+        assert '# TYPE db_queries_max gauge' in body
+        assert 'template_seconds_sum{view="index"}' in body
+        assert 'cache_requests_total{cache="fragment",result="miss"}' in body
+        # Каждая метрика объявлена ровно один раз.
+        types = [line for line in body.splitlines()
+                 if line.startswith('# TYPE')]
+        assert len(types) == len(set(types))
+
+    @pytest.mark.django_db(transaction=True)
+    def test_template_time_without_signal(self, client, post):
+        from django.template import engines
+
+        from posts.instrumentation import TimedTemplate
+
+        assert isinstance(engines.all()[0].get_template('index.html'),
+                          TimedTemplate)
+        timing = client.get('/')['Server-Timing']
+        assert 'tpl;dur=0.0' not in timing
+
+    @pytest.mark.django_db(transaction=True)
+    def test_sampling_disabled(self, client, settings, post):
+        settings.INSTRUMENTATION = {'SAMPLE_RATE': 0}
+        response = client.get('/')
+        assert 'Server-Timing' not in response
+        assert not metrics.snapshot()[1]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_endpoint_access(self, client, settings):
+        # Адрес из INTERNAL_IPS (как у обратного прокси) доступа не даёт.
+        settings.INTERNAL_IPS = ['127.0.0.1']
+        settings.INSTRUMENTATION = {'TOKEN': 'secret'}
+        assert client.get('/metrics/').status_code == 404
+        response = client.get('/metrics/',
+                              HTTP_AUTHORIZATION='Bearer secret')
+        assert response.status_code == 200
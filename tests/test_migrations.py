@@ -0,0 +1,37 @@
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+
+def migrate(target):
+    executor = MigrationExecutor(connection)
+    executor.migrate([('posts', target)])
+    executor.loader.build_graph()
+    return executor.loader.project_state([('posts', target)]).apps
+
+
+@pytest.fixture
+def migrated_back(transactional_db):
+    # Схема до счётчиков и UniqueConstraint; после теста — снова текущая.
+    latest = MigrationExecutor(connection).loader.graph.leaf_nodes('posts')
+    yield migrate('0011_timelineentry')
+    MigrationExecutor(connection).migrate(latest)
+
+
+class TestMigrations:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_duplicate_follows_fix_counters(self, migrated_back):
+        apps = migrated_back
+        User = apps.get_model('auth', 'User')
+        Follow = apps.get_model('posts', 'Follow')
+        reader, author = (User.objects.create(username=name)
+                          for name in ('reader', 'author'))
+        for _ in range(3):
+            Follow.objects.create(user=reader, author=author)
+
+        apps = migrate('0013_feed_indexes')
+        UserStats = apps.get_model('posts', 'UserStats')
+        assert apps.get_model('posts', 'Follow').objects.count() == 1
+        assert UserStats.objects.get(user=author.pk).followers_count == 1
+        assert UserStats.objects.get(user=reader.pk).following_count == 1
@@ -6,7 +6,7 @@ from django import forms
 from django.contrib.auth import get_user_model
 from django.core.files.base import File
 from posts.models import Post
-from django.db.models.query import QuerySet
+from posts.pagination import CursorPage
 
 def get_field_context(context, field_type):
     for field in context.keys():
@@ -51,9 +51,9 @@ class TestPostView:
         assert type(comment_form_context.fields['text']) == forms.fields.CharField, \
             'Проверьте, что форма комментария в контекстке страницы `/<username>/<post_id>/` содержится поле `text` типа `CharField`'
 
-        comment_context = get_field_context(response.context, QuerySet)
+        comment_context = get_field_context(response.context, CursorPage)
         assert comment_context is not None, \
-            'Проверьте, что передали список комментариев в контекст страницы `/<username>/<post_id>/` типа `QuerySet`'
+            'Проверьте, что передали страницу комментариев в контекст страницы `/<username>/<post_id>/` типа `CursorPage`'
 
 
 class TestPostEditView:
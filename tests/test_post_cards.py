@@ -0,0 +1,48 @@
+import pytest
+from django.template import Context, Template
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+
+def render_cards(posts, user=None):
+    template = Template('{% load feed_tags %}{% post_cards posts %}')
+    return template.render(Context({'posts': posts, 'user': user}))
+
+
+class TestPostCards:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_urls_match_reverse(self, django_user_model):
+        author = django_user_model.objects.create_user(
+            username='Автор.1+_-@', password='1234567')
+        group = Group.objects.create(title='Группа', slug='group-1_x')
+        post = Post.objects.create(text='Текст', author=author, group=group)
+
+        html = render_cards([post])
+        for url in (reverse('profile', args=(author.username,)),
+                    reverse('post', args=(author.username, post.pk)),
+                    reverse('group_post', args=(group.slug,))):
+            assert f'href="{url}"' in html
+        assert 'Edit' not in html
+
+    @pytest.mark.django_db(transaction=True)
+    def test_edit_link_only_for_author(self, user, post, django_user_model):
+        other = django_user_model.objects.create_user(
+            username='other', password='1234567')
+        edit = reverse('post_edit', args=(user.username, post.pk))
+        assert edit in render_cards([post], user)
+        assert edit not in render_cards([post], other)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feed_and_post_pages(self, user_client, user, post_with_group):
+        response = user_client.get('/')
+        assert response.status_code == 200
+        html = response.content.decode()
+        assert html.count('class="card mb-3 mt-1 shadow-sm"') == 1
+        assert reverse('post_edit', args=(user.username,
+                                          post_with_group.pk)) in html
+
+        response = user_client.get(
+            reverse('post', args=(user.username, post_with_group.pk)))
+        assert 'Тестовый пост 2' in response.content.decode()
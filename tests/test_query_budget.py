@@ -0,0 +1,44 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from posts.models import Comment, Follow, Post
+
+# Число запросов на страницу не должно зависеть от числа постов.
+FEED_QUERY_BUDGET = 8
+
+
+@pytest.fixture
+def feed(user, group):
+    author = get_user_model().objects.create_user(username='author')
+    Follow.objects.create(user=user, author=author)
+    for i in range(10):
+        post = Post.objects.create(text=f'Пост {i}', author=author,
+                                   group=group)
+        Comment.objects.create(post=post, author=user, text='комментарий')
+    return author
+
+
+class TestFeedQueryBudget:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('url', ['/', '/group/test-link/', '/author/'])
+    def test_public_feeds(self, client, feed, url,
+                          django_assert_max_num_queries):
+        with django_assert_max_num_queries(FEED_QUERY_BUDGET):
+            response = client.get(url)
+        assert response.status_code == 200
+        assert '1 comment' in response.content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed(self, user_client, feed,
+                         django_assert_max_num_queries):
+        with django_assert_max_num_queries(FEED_QUERY_BUDGET):
+            response = user_client.get('/follow/')
+        assert len(response.context['page']) == 10
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_view(self, client, feed, django_assert_max_num_queries):
+        post = feed.posts.first()
+        with django_assert_max_num_queries(FEED_QUERY_BUDGET):
+            response = client.get(f'/author/{post.pk}/')
+        assert response.context['post'].comment_count == 1
@@ -0,0 +1,46 @@
+import logging
+
+import pytest
+from django.urls import resolve
+
+from posts.models import Comment, Post
+from posts.querylog import QueryBudgetExceeded, capture, fingerprint
+
+
+class TestQueryLog:
+
+    def test_fingerprint(self):
+        assert fingerprint(
+            "SELECT * FROM t WHERE a = 15 AND b = 'x''y' AND c IN (%s, %s)"
+        ) == 'SELECT * FROM t WHERE a = ? AND b = ? AND c IN (...)'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_n_plus_one_and_duplicates(self, post, user):
+        for i in range(5):
+            Comment.objects.create(post=post, author=user, text=str(i))
+        with capture() as log:
+            for comment in Comment.objects.all():
+                comment.author.username
+            Post.objects.filter(pk=post.pk).exists()
+            Post.objects.filter(pk=post.pk).exists()
+        problems = log.problems('test')
+        repeated = [line for line in problems if 'N+1?' in line]
+        assert len(repeated) == 1
+        assert 'x5 в tests/test_querylog.py:' in repeated[0]
+        duplicate = [line for line in problems if 'дубль x2' in line]
+        assert any('posts_post' in line for line in duplicate)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_slow_query_logged(self, client, settings, caplog):
+        settings.QUERY_LOG = {'ENABLED': True, 'SLOW_MS': 0}
+        with caplog.at_level(logging.WARNING, logger='posts.querylog'):
+            client.get('/')
+        assert 'медленный запрос' in caplog.text
+        assert 'posts/' in caplog.text
+
+    @pytest.mark.django_db(transaction=True)
+    def test_budget_raises_in_tests(self, client, post, monkeypatch):
+        # Синхронное или асинхронное представление — по ASYNC_VIEWS.
+        monkeypatch.setattr(resolve('/').func, 'query_budget', 1)
+        with pytest.raises(QueryBudgetExceeded, match='бюджете 1'):
+            client.get('/')
@@ -0,0 +1,90 @@
+from io import BytesIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, features
+
+from posts import renditions
+from posts.models import Post
+
+
+def image_file(name='image.png', size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGBA', size, (255, 0, 0)).save(buffer, 'png')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+class TestRenditions:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_new_post_generates_card(self, user_client, media_root):
+        user_client.post('/new/', {'text': 'с картинкой',
+                                   'image': image_file()})
+        post = Post.objects.get()
+        name = post.renditions['card']
+        with default_storage.open(name) as stored:
+            assert Image.open(stored).size == (960, 339)
+
+        response = user_client.get('/')
+        assert post.card_url in response.content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feed_does_not_touch_pillow(self, client, user, media_root,
+                                        monkeypatch):
+        post = Post.objects.create(text='пост', author=user)
+        post.image.save('image.png', image_file(), save=True)
+        renditions.generate(post.pk)
+
+        def fail(*args, **kwargs):
+            raise AssertionError('Pillow при рендере ленты')
+        monkeypatch.setattr(Image, 'open', fail)
+        monkeypatch.setattr(features, 'check', fail)
+        response = client.get('/')
+        assert 'renditions' in response.content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_missing_file_is_logged_not_raised(self, post, media_root):
+        assert renditions._run(post.pk) is None
+        post.refresh_from_db()
+        assert post.renditions == {}
+
+
+class TestResponsiveRenditions:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_picture_has_modern_sources(self, client, user, media_root):
+        post = Post.objects.create(text='пост', author=user)
+        post.image.save('image.png', image_file(size=(2000, 900)), save=True)
+        renditions.generate(post.pk)
+        post.refresh_from_db()
+        assert {'avif-480', 'webp-1440', 'jpg-960', 'card'} <= set(
+            post.renditions)
+
+        content = client.get('/').content.decode()
+        assert '<picture>' in content
+        assert 'type="image/webp"' in content
+        assert '1440w' in content
+
+    @pytest.mark.django_db(transaction=True)
+    def test_small_originals_are_not_upscaled(self, user, media_root):
+        post = Post.objects.create(text='пост', author=user)
+        post.image.save('image.png', image_file(size=(500, 300)), save=True)
+        result = renditions.generate(post.pk)
+        assert 'webp-1440' not in result
+        assert 'webp-480' in result and 'card' in result
+
+    @pytest.mark.django_db(transaction=True)
+    def test_backfill_command(self, user, media_root):
+        from django.core.management import call_command
+        post = Post.objects.create(text='пост', author=user)
+        post.image.save('image.png', image_file(), save=True)
+        call_command('generate_renditions', '--workers', '2')
+        post.refresh_from_db()
+        assert 'card' in post.renditions
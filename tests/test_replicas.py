@@ -0,0 +1,59 @@
+import time
+
+import pytest
+from django.core.management import call_command
+from django.db import connections
+
+from posts.models import Post
+from posts.routers import ReplicaRouter
+
+
+@pytest.fixture
+def replica(transactional_db, tmp_path, settings):
+    """Вторая SQLite-база в файле; репликации нет, поэтому всё, что
+    записано в основную БД, на «реплике» не видно."""
+    connections.settings['replica'] = {
+        **connections['default'].settings_dict,
+        'NAME': str(tmp_path / 'replica.sqlite3'),
+    }
+    # Тест объявлен только для default, и ensure_connection не пустит к
+    # новому алиасу: соединяемся напрямую.
+    connections['replica'].connect()
+    call_command('migrate', database='replica', verbosity=0)
+    settings.DATABASE_REPLICAS = {'ALIASES': ['replica'],
+                                  'STICKY_SECONDS': 5}
+    yield 'replica'
+    connections['replica'].close()
+    del connections['replica']
+    del connections.settings['replica']
+
+
+class TestReplicaRouting:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feed_reads_go_to_replica(self, client, post, replica):
+        response = client.get('/')
+        assert list(response.context['page']) == []
+        assert Post.objects.using(replica).count() == 0
+        # Остальные представления читают основную БД.
+        response = client.get(f'/{post.author.username}/followers/')
+        assert response.status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_own_write_sticks_to_primary(self, user_client, replica):
+        response = user_client.post('/new/', {'text': 'Только что'})
+        assert response.status_code == 302
+        assert float(response.cookies['primary_until'].value) > time.time()
+        response = user_client.get('/')
+        assert [post.text for post in response.context['page']] == [
+            'Только что']
+        # Окно истекло — снова реплика, где нет ни поста, ни сессии.
+        user_client.cookies['primary_until'] = '0'
+        response = user_client.get('/')
+        assert list(response.context['page']) == []
+        assert not response.context['user'].is_authenticated
+
+    def test_router_outside_requests(self):
+        router = ReplicaRouter()
+        assert router.db_for_read(Post) is None
+        assert router.db_for_write(Post) == 'default'
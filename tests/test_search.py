@@ -0,0 +1,81 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from posts.models import Post
+from posts.pagination import encode_cursor
+from posts.search import TABLE, get_search_backend
+
+
+@pytest.fixture(autouse=True)
+def empty_index(transactional_db):
+    # flush очищает только таблицы моделей, FTS-индекс чистим сами.
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+
+
+class TestSearch:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_search_text_group_and_author(self, client, user, group):
+        Post.objects.create(text='Котики правят миром', author=user)
+        Post.objects.create(text='Про собак', author=user, group=group)
+
+        response = client.get('/search/', {'q': 'котик'})
+        assert [p.text for p in response.context['page']] == [
+            'Котики правят миром']
+        response = client.get('/search/', {'q': 'Тестовая группа'})
+        assert [p.text for p in response.context['page']] == ['Про собак']
+        response = client.get('/search/', {'q': user.username})
+        assert len(response.context['page']) == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_follows_edits_and_deletes(self, user, group):
+        post = Post.objects.create(text='старый текст', author=user)
+        backend = get_search_backend()
+        post.text = 'новый текст'
+        post.save()
+        assert not backend.search('старый').object_list
+        assert backend.search('новый').object_list == [post]
+
+        post.group = group
+        post.save()
+        group.title = 'Переименованная'
+        group.save()
+        assert backend.search('переименованная').object_list == [post]
+
+        post.delete()
+        assert not backend.search('новый').object_list
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cursor_pages_and_reindex(self, client, user):
+        for i in range(15):
+            Post.objects.create(text=f'поиск номер {i}', author=user)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+        call_command('reindex_search')
+
+        first = client.get('/search/', {'q': 'поиск'}).context['page']
+        assert len(first) == 10 and first.has_next()
+        second = client.get('/search/', {'q': 'поиск',
+                                         'cursor': first.next_cursor})
+        page = second.context['page']
+        assert len(page) == 5 and not page.has_next()
+        assert not {p.pk for p in first} & {p.pk for p in page}
+        assert 'q=%D0%BF%D0%BE%D0%B8%D1%81%D0%BA' in (
+            second.content.decode())
+
+    @pytest.mark.django_db(transaction=True)
+    def test_query_syntax_is_escaped(self, client, post):
+        response = client.get('/search/', {'q': '"OR* NEAR( -'})
+        assert response.status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_malformed_cursor_falls_back_to_first_page(self, client, post):
+        for values in ([1], [[1], 2], ['x', 2], [1.5, '2'], [1, 2, 3]):
+            cursor = encode_cursor(values, 'next', 3)
+            response = client.get('/search/', {'q': 'тестовый',
+                                               'cursor': cursor})
+            assert response.status_code == 200, values
+            page = response.context['page']
+            assert page.number == 1 and [p.pk for p in page] == [post.pk]
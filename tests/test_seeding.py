@@ -0,0 +1,56 @@
+import io
+from collections import Counter
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+from posts.seeding import Seeder
+
+
+def seed(**options):
+    options = {'users': 50, 'groups': 3, 'posts': 500, 'follows': 5,
+               'comments': 200, 'images': 0, 'batch_size': 100, **options}
+    return Seeder(**options).run()
+
+
+class TestSeeding:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_counts_and_skew(self):
+        counts = seed()
+        assert counts['users'] == 50 and counts['posts'] == 500
+        assert Post.objects.count() == 500
+        assert Comment.objects.count() == 200
+        assert Group.objects.count() == 3
+        assert counts['follows'] == Follow.objects.count() > 0
+        assert not Follow.objects.filter(
+            user=F('author')).exists()
+        authors = Counter(Post.objects.values_list('author', flat=True))
+        top = sum(count for _, count in authors.most_common(5))
+        # Ципф: пятеро самых активных авторов пишут заметную долю постов.
+        assert top > 500 * 0.3
+
+    @pytest.mark.django_db(transaction=True)
+    def test_deterministic(self):
+        seed(seed=7)
+        first = list(Post.objects.order_by('pk').values_list(
+            'author__username', 'group__slug'))
+        for model in (Comment, Follow, Post, Group, get_user_model()):
+            model.objects.all().delete()
+        seed(seed=7)
+        second = list(Post.objects.order_by('pk').values_list(
+            'author__username', 'group__slug'))
+        assert first == second
+
+    @pytest.mark.django_db(transaction=True)
+    def test_command_rebuilds_counters(self):
+        out = io.StringIO()
+        call_command('seed_data', '--users', '20', '--posts', '100',
+                     '--comments', '30', '--images', '0', stdout=out)
+        assert 'posts: 100' in out.getvalue()
+        stats = UserStats.objects.order_by('-posts_count').first()
+        assert stats.posts_count == Post.objects.filter(
+            author=stats.user_id).count()
@@ -0,0 +1,24 @@
+import pytest
+
+from users.forms import CreationForm, reserved_usernames
+
+
+def signup_form(username):
+    password = 'Sl0zhny-parol'
+    return CreationForm({'username': username, 'email': 'a@example.com',
+                         'password1': password, 'password2': password})
+
+
+class TestSignup:
+
+    def test_site_routes_are_reserved(self):
+        assert {'search', 'api', 'metrics', 'follow', 'new'} <= (
+            reserved_usernames())
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('username', ['search', 'api', 'metrics'])
+    def test_reserved_username_rejected(self, username):
+        form = signup_form(username)
+        assert not form.is_valid()
+        assert 'username' in form.errors
+        assert signup_form(username + '_1').is_valid()
@@ -0,0 +1,31 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+
+from posts.sqlite import DEFAULTS, apply_pragmas
+
+
+def pragma(raw, name):
+    return raw.execute('PRAGMA %s' % name).fetchone()[0]
+
+
+class TestSqlitePragmas:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_applied_on_connect(self):
+        connection.ensure_connection()
+        raw = connection.connection
+        assert pragma(raw, 'synchronous') == 1  # NORMAL
+        assert pragma(raw, 'busy_timeout') == DEFAULTS['busy_timeout']
+
+    def test_file_database_switches_to_wal(self, tmp_path, settings):
+        raw = sqlite3.connect(tmp_path / 'db.sqlite3')
+        apply_pragmas(None, SimpleNamespace(vendor='sqlite', connection=raw))
+        assert pragma(raw, 'journal_mode') == 'wal'
+        settings.SQLITE_PRAGMAS = {}
+        other = sqlite3.connect(tmp_path / 'other.sqlite3')
+        apply_pragmas(None, SimpleNamespace(vendor='sqlite',
+                                            connection=other))
+        assert pragma(other, 'journal_mode') == 'delete'
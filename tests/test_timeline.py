@@ -0,0 +1,74 @@
+import datetime as dt
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+
+from posts.models import Follow, Post, TimelineEntry
+from posts.timeline import CELEBRITY_CACHE_KEY, get_timeline
+
+
+@pytest.fixture
+def author():
+    return get_user_model().objects.create_user(username='author')
+
+
+class TestTimeline:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fan_out_backfill_and_prune(self, user, author):
+        Post.objects.create(text='до подписки', author=author)
+        Follow.objects.create(user=user, author=author)
+        assert TimelineEntry.objects.filter(user=user).count() == 1
+
+        Post.objects.create(text='после подписки', author=author)
+        assert get_timeline().posts(user).count() == 2
+
+        Follow.objects.get(user=user, author=author).delete()
+        assert not TimelineEntry.objects.filter(user=user).exists()
+        assert get_timeline().posts(user).count() == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_celebrity_posts_are_pulled(self, user, author):
+        from django.core.cache import cache
+        cache.delete(CELEBRITY_CACHE_KEY)
+        with override_settings(FOLLOW_TIMELINE={'FANOUT_LIMIT': 0}):
+            Follow.objects.create(user=user, author=author)
+            cache.delete(CELEBRITY_CACHE_KEY)
+            Post.objects.create(text='звезда', author=author)
+            assert not TimelineEntry.objects.exists()
+            assert get_timeline().posts(user).count() == 1
+        cache.delete(CELEBRITY_CACHE_KEY)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rebuild_command(self, user, author):
+        Follow.objects.create(user=user, author=author)
+        Post.objects.create(text='пост', author=author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines')
+        assert TimelineEntry.objects.filter(user=user).count() == 1
+        with override_settings(FOLLOW_TIMELINE={'MAX_ENTRIES': 0}):
+            call_command('rebuild_timelines', '--trim')
+        assert not TimelineEntry.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_push_trims_inbox(self, user, author):
+        Follow.objects.create(user=user, author=author)
+        with override_settings(FOLLOW_TIMELINE={'MAX_ENTRIES': 2}):
+            posts = [Post.objects.create(text=f'пост {i}', author=author)
+                     for i in range(4)]
+        assert set(TimelineEntry.objects.filter(user=user)
+                   .values_list('post', flat=True)) == {
+            post.pk for post in posts[-2:]}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_edit_moves_entry(self, user, author):
+        Follow.objects.create(user=user, author=author)
+        old, new = (Post.objects.create(text=text, author=author)
+                    for text in ('старый', 'новый'))
+        old.pub_date = new.pub_date + dt.timedelta(hours=1)
+        old.save()
+        assert TimelineEntry.objects.get(post=old).pub_date == old.pub_date
+        entries = TimelineEntry.objects.filter(user=user)
+        assert entries.order_by('-pub_date')[0].post_id == old.pk
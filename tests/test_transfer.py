@@ -0,0 +1,118 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+from posts.models import Follow, Group, Post, UserStats
+from posts.search import get_search_backend
+
+
+def export(fmt):
+    out = io.StringIO()
+    call_command('export_posts', '--format', fmt, stdout=out,
+                 stderr=io.StringIO())
+    return out.getvalue()
+
+
+class TestTransfer:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_jsonl_round_trip(self, tmp_path, post, post_with_group):
+        dump = export('jsonl')
+        rows = [json.loads(line) for line in dump.splitlines()]
+        assert [row['id'] for row in rows] == [post.pk, post_with_group.pk]
+        assert rows[1]['group'] == 'test-link'
+
+        source = tmp_path / 'posts.jsonl'
+        source.write_text(dump.replace('TestUser', 'Imported')
+                          .replace('test-link', 'new-group'))
+        out = io.StringIO()
+        call_command('import_posts', str(source), '--create-missing',
+                     '--batch-size', '1', stdout=out)
+        assert 'Импортировано: 2, пропущено: 0' in out.getvalue()
+        imported = Post.objects.filter(author__username='Imported')
+        assert list(imported.values_list('pub_date', flat=True)) == list(
+            Post.objects.filter(author__username='TestUser')
+            .values_list('pub_date', flat=True))
+        group = Group.objects.get(slug='new-group')
+        assert group.title == 'Тестовая группа 1'
+        assert group.posts_count == 1
+        assert UserStats.objects.get(
+            user__username='Imported').posts_count == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_csv_skips_bad_rows(self, tmp_path, user, post):
+        source = tmp_path / 'posts.csv'
+        source.write_text(export('csv') + '\n'.join([
+            ',Без автора,,,,,',
+            ',Чужой автор,,Nobody,,,',
+            ',Плохая дата,вчера,TestUser,,,',
+        ]) + '\n')
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_posts', str(source), '--skip-derived',
+                     stdout=out, stderr=err)
+        assert 'Импортировано: 1, пропущено: 3' in out.getvalue()
+        assert "'Nobody'" in err.getvalue()
+        assert Post.objects.filter(author=user).count() == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_bad_json_and_impossible_date_are_skipped(self, tmp_path, user):
+        source = tmp_path / 'posts.jsonl'
+        source.write_text('\n'.join([
+            '{"text": "Хороший", "author": "TestUser"}',
+            '{"text": "Оборван',
+            '[1, 2]',
+            '{"text": "Нет даты", "author": "TestUser", '
+            '"pub_date": "2024-13-01T00:00:00"}',
+        ]) + '\n')
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_posts', str(source), '--skip-derived',
+                     stdout=out, stderr=err)
+        assert 'Импортировано: 1, пропущено: 3' in out.getvalue()
+        assert 'Запись 2: неверный JSON' in err.getvalue()
+        assert "неверная дата '2024-13-01T00:00:00'" in err.getvalue()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fields_of_wrong_type_are_skipped(self, tmp_path, user):
+        source = tmp_path / 'posts.jsonl'
+        source.write_text('\n'.join(json.dumps(row) for row in [
+            {'text': 'Первый', 'author': 'TestUser'},
+            {'text': 'Список', 'author': ['TestUser']},
+            {'text': 'Без автора'},
+            {'text': 'Группа-объект', 'author': 'TestUser',
+             'group': {'slug': 'x'}},
+            {'text': 'Последний', 'author': 'TestUser'},
+        ]) + '\n')
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_posts', str(source), '--skip-derived',
+                     '--create-missing', stdout=out, stderr=err)
+        assert 'Импортировано: 2, пропущено: 3' in out.getvalue()
+        assert "Запись 2: поле author не строка: ['TestUser']" in (
+            err.getvalue())
+        assert 'Запись 3: нет автора' in err.getvalue()
+        assert set(Post.objects.values_list('text', flat=True)) == {
+            'Первый', 'Последний'}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rebuild_is_scoped_to_imported_rows(
+            self, tmp_path, user, group, user_client, django_user_model):
+        another_user = django_user_model.objects.create_user(
+            username='Author')
+        Follow.objects.create(user=user, author=another_user)
+        UserStats.objects.filter(user=user).update(posts_count=99)
+        source = tmp_path / 'posts.jsonl'
+        source.write_text(json.dumps(
+            {'text': 'Импортный пост', 'author': another_user.username,
+             'group': group.slug}) + '\n')
+        call_command('import_posts', str(source), stdout=io.StringIO())
+
+        post = Post.objects.get(text='Импортный пост')
+        assert UserStats.objects.get(user=another_user).posts_count == 1
+        assert Group.objects.get(pk=group.pk).posts_count == 1
+        # Чужие счётчики не пересчитываются.
+        assert UserStats.objects.get(user=user).posts_count == 99
+        assert get_search_backend().search('импортный').object_list == [
+            post]
+        page = user_client.get('/follow/').context['page']
+        assert [p.pk for p in page] == [post.pk]
@@ -0,0 +1,55 @@
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from posts.metrics import metrics
+from posts.models import Post
+
+
+def png(size=(300, 200)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (0, 128, 0)).save(buffer, 'png')
+    return SimpleUploadedFile('image.png', buffer.getvalue(),
+                              content_type='image/png')
+
+
+@pytest.fixture
+def limits(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.UPLOAD_LIMITS = {'DOWNSCALE_TO': None}
+    return settings
+
+
+class TestUploadLimits:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_too_many_bytes(self, user_client, limits):
+        limits.UPLOAD_LIMITS = {'MAX_BYTES': 100}
+        response = user_client.post('/new/', {'text': 'т', 'image': png()})
+        assert response.status_code == 200
+        assert 'image' in response.context['form'].errors
+        assert not Post.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_too_many_pixels_from_header(self, user_client, limits):
+        limits.UPLOAD_LIMITS = {'MAX_PIXELS': 1000}
+        metrics.reset()
+        response = user_client.post('/new/', {'text': 'т', 'image': png()})
+        assert 'image' in response.context['form'].errors
+        counters, _ = metrics.snapshot()
+        assert counters[('upload_rejected_total',
+                         (('reason', 'pixels'),))] == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_oversized_original_is_downscaled(self, user_client, limits):
+        limits.UPLOAD_LIMITS = {'DOWNSCALE_TO': 100}
+        metrics.reset()
+        user_client.post('/new/', {'text': 'т', 'image': png()})
+        post = Post.objects.get()
+        with post.image.open() as stored:
+            assert Image.open(stored).size == (100, 67)
+        _, summaries = metrics.snapshot()
+        assert ('upload_process_seconds', ()) in summaries
+        assert ('upload_bytes', ()) in summaries
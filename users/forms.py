@@ -1,11 +1,47 @@
+import functools
+
+from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
+from django.urls import get_resolver
+from django.urls.resolvers import RoutePattern
 
 
 User = get_user_model()
 
 
+def _route_prefixes(patterns):
+    for pattern in patterns:
+        if not isinstance(pattern.pattern, RoutePattern):
+            continue
+        route = str(pattern.pattern)
+        if not route and hasattr(pattern, 'url_patterns'):
+            # include() без префикса: его адреса лежат в корне сайта.
+            yield from _route_prefixes(pattern.url_patterns)
+            continue
+        segment = route.split('/', 1)[0]
+        if segment and '<' not in segment:
+            yield segment
+
+
+@functools.lru_cache(maxsize=None)
+def reserved_usernames():
+    """Первые сегменты адресов сайта: search, api, metrics...
+
+    Профиль /<username>/ стоит в URLconf после них, и пользователь с таким
+    именем получил бы чужую страницу вместо своего профиля.
+    """
+    return frozenset(_route_prefixes(get_resolver().url_patterns))
+
+
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+    def clean_username(self):
+        username = super().clean_username()
+        if username in reserved_usernames():
+            raise forms.ValidationError(
+                'Это имя занято адресом сайта, выберите другое.')
+        return username